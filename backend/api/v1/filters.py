@@ -1,7 +1,13 @@
-import os, uuid, io, base64
-from flask import Blueprint, request, jsonify
+import os, re, time, uuid, base64
+from flask import Blueprint, Response, request, jsonify, send_file, abort
 from PIL import Image
-from services.filters import apply_filter
+from api.v1.uploads import read_frames
+from services.codec import InvalidImage, decode_image
+from services.encode import EXTENSIONS, encode_image, mimetype, negotiate_format
+from services import janitor
+from services.expiry import expiry_index
+from services.filters import FILTER_TYPES, apply_filter, list_backdrops
+from services.storage import LocalStorage
 
 bp = Blueprint("filters", __name__, url_prefix="/api/v1/filters")
 
@@ -9,20 +15,58 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 TMP_DIR = os.path.abspath(os.environ.get("TMP_DIR", os.path.join(BASE_DIR, "tmp")))
 os.makedirs(TMP_DIR, exist_ok=True)
 
-def _decode_data_url(data_url: str) -> Image.Image:
-    """Decode base64 data URL to PIL Image"""
-    if "," not in data_url:
-        raise ValueError("Invalid data URL")
-    _, b64 = data_url.split(",", 1)
-    raw = base64.b64decode(b64)
-    return Image.open(io.BytesIO(raw)).convert("RGBA")
+RESPONSE_MODES = ("json", "multipart", "urls")
+RESULT_TTL = int(os.environ.get("FILTER_RESULT_TTL", 300))
+RESULT_NAME = re.compile(r"[0-9a-f]{32}\.(png|jpg|webp)")
+# Filter results stay on this node's disk whatever STRIP_STORAGE says; they live for minutes
+_results = LocalStorage(TMP_DIR)
 
-def _encode_to_data_url(image: Image.Image) -> str:
+def _encode_to_data_url(image: Image.Image, fmt: str = "png", quality: int | None = None) -> str:
     """Encode PIL Image to base64 data URL"""
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    b64 = base64.b64encode(buffer.getvalue()).decode()
-    return f"data:image/png;base64,{b64}"
+    b64 = base64.b64encode(encode_image(image, fmt, quality)).decode()
+    return f"data:{mimetype(fmt)};base64,{b64}"
+
+def _check_param(key: str, value) -> None:
+    """Reject a bad filterType / intensity while the images are still streaming in"""
+    if key == "filterType" and value not in FILTER_TYPES:
+        raise ValueError("Invalid filterType")
+    if key == "intensity" and not (0.0 <= float(value) <= 2.0):
+        raise ValueError("intensity must be between 0.0 and 2.0")
+
+def _response_mode(data) -> str:
+    """Explicit "response" param, else multipart when the Accept header names multipart/mixed"""
+    mode = data.get("response")
+    if mode:
+        if mode not in RESPONSE_MODES:
+            raise ValueError(f"response must be one of: {', '.join(RESPONSE_MODES)}")
+        return mode
+    if any(value == "multipart/mixed" and q > 0 for value, q in request.accept_mimetypes):
+        return "multipart"
+    return "json"
+
+def _multipart_response(images, fmt: str, quality: int | None) -> Response:
+    """multipart/mixed body with one raw image part per frame, encoded as it is sent"""
+    boundary = uuid.uuid4().hex
+
+    def parts():
+        for i, img in enumerate(images):
+            body = encode_image(img, fmt, quality)
+            yield (f"--{boundary}\r\nContent-Type: {mimetype(fmt)}\r\n"
+                   f"Content-Disposition: inline; name=\"image\"; filename=\"{i}.{EXTENSIONS[fmt]}\"\r\n"
+                   f"Content-Length: {len(body)}\r\n\r\n").encode()
+            yield body
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+
+    return Response(parts(), mimetype=f"multipart/mixed; boundary={boundary}")
+
+def _save_result(image: Image.Image, fmt: str, quality: int | None) -> str:
+    """Write a filtered frame for short-lived download and return its URL"""
+    name = f"{uuid.uuid4().hex}.{EXTENSIONS[fmt]}"
+    size = _results.put(name, [encode_image(image, fmt, quality)])
+    expiry_index(TMP_DIR).add(name, RESULT_TTL)
+    janitor.record(TMP_DIR, name, size)
+    return f"/api/v1/filters/result/{name}"
 
 @bp.post("/apply")
 def apply():
@@ -32,45 +76,99 @@ def apply():
     Request body:
     {
         "images": ["data:image/png;base64,...", ...],  # Array of base64 data URLs
-        "filterType": "grayscale" | "sepia" | "brightness" | "contrast" | "blur" | "sharpen",
-        "intensity": 1.0  # Optional, default 1.0 (0.0 to 2.0)
+        "filterType": "grayscale" | "sepia" | "brightness" | "contrast" | "blur" | "sharpen" | "chromakey",
+        "intensity": 1.0,  # Optional, default 1.0 (0.0 to 2.0)
+        "backdrop": "white",  # Optional, chromakey only
+        "format": "png" | "jpeg" | "webp",  # Optional, otherwise from Accept (default png)
+        "quality": 80,  # Optional, jpeg/webp only
+        "response": "json" | "multipart" | "urls"  # Optional, see below
     }
     
-    Response:
+    The same fields can be sent as multipart/form-data (one "images" file part per
+    image) or as an application/octet-stream body with params in the query string.
+    
+    Response (json, the default):
     {
         "filteredImages": ["data:image/png;base64,...", ...]
     }
+
+    With "response": "multipart" (or Accept: multipart/mixed) the frames come back as
+    raw image parts of a multipart/mixed body. With "response": "urls":
+    {
+        "filteredUrls": ["/api/v1/filters/result/<name>.png", ...],
+        "expiresIn": 300
+    }
     """
-    data = request.get_json(force=True) or {}
-    images_data = data.get("images", [])
+    try:
+        images_data, data = read_frames("images", validate=_check_param)
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
     filter_type = data.get("filterType")
     intensity = float(data.get("intensity", 1.0))
+    backdrop = data.get("backdrop", "white")
     
     # Validation
     if not isinstance(images_data, list) or len(images_data) == 0:
         return jsonify(error={"code": "bad_request", "message": "images array is required"}), 400
     
-    if filter_type not in ["grayscale", "sepia", "brightness", "contrast", "blur", "sharpen"]:
+    if filter_type not in FILTER_TYPES:
         return jsonify(error={"code": "bad_request", "message": "Invalid filterType"}), 400
     
+    if filter_type == "chromakey" and backdrop not in list_backdrops():
+        return jsonify(error={"code": "bad_request", "message": "Unknown backdrop"}), 400
+    
     if not (0.0 <= intensity <= 2.0):
         return jsonify(error={"code": "bad_request", "message": "intensity must be between 0.0 and 2.0"}), 400
     
     try:
-        # Decode images
-        images = [_decode_data_url(img_data) for img_data in images_data]
-        
+        fmt, quality = negotiate_format(request.accept_mimetypes, data.get("format"), data.get("quality"))
+        mode = _response_mode(data)
+    except (TypeError, ValueError) as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    
+    try:
+        # Decode images; headers are validated before any pixels are decoded
+        images = [decode_image(img_data) for img_data in images_data]
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    
+    try:
         # Apply filter to each image
-        filtered_images = [apply_filter(img, filter_type, intensity) for img in images]
+        filtered_images = [apply_filter(img, filter_type, intensity, backdrop=backdrop) for img in images]
+        
+        if mode == "multipart":
+            return _multipart_response(filtered_images, fmt, quality)
+        
+        if mode == "urls":
+            urls = [_save_result(img, fmt, quality) for img in filtered_images]
+            return jsonify(filteredUrls=urls, expiresIn=RESULT_TTL)
         
         # Encode back to data URLs
-        filtered_data = [_encode_to_data_url(img) for img in filtered_images]
+        filtered_data = [_encode_to_data_url(img, fmt, quality) for img in filtered_images]
         
         return jsonify(filteredImages=filtered_data)
     
     except Exception as e:
         return jsonify(error={"code": "processing_error", "message": str(e)}), 500
 
+@bp.get("/result/<name>")
+def result(name):
+    """Serve a filtered frame written by apply with "response": "urls" until it expires"""
+    if not RESULT_NAME.fullmatch(name):
+        abort(404)
+    path = os.path.join(TMP_DIR, name)
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        abort(404)
+    if age > RESULT_TTL:
+        abort(404)
+    ext = name.rsplit(".", 1)[1]
+    fmt = "jpeg" if ext == "jpg" else ext
+    return send_file(path, mimetype=mimetype(fmt), max_age=int(RESULT_TTL - age))
+
 @bp.get("/types")
 def get_filter_types():
     """Get available filter types"""
@@ -122,5 +220,14 @@ def get_filter_types():
             "defaultIntensity": 1.0,
             "minIntensity": 0.0,
             "maxIntensity": 1.0
+        },
+        {
+            "id": "chromakey",
+            "name": "Green Screen",
+            "description": "Replace a green background with a backdrop",
+            "defaultIntensity": 1.0,
+            "minIntensity": 0.0,
+            "maxIntensity": 2.0,
+            "backdrops": list_backdrops()
         }
     ])
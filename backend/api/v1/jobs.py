@@ -0,0 +1,89 @@
+import json
+from flask import Blueprint, Response, request, jsonify, abort
+from api.v1.render import parse_render_request
+from services.jobs import Job, QueueFull, get_job, submit
+
+bp = Blueprint("jobs", __name__, url_prefix="/api/v1/jobs")
+
+def _job(job_id: str) -> Job:
+    job = get_job(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+def _last_event_id() -> int:
+    """Index of the last event a reconnecting client saw; -1 (replay all) when absent or malformed"""
+    try:
+        return max(-1, int(request.headers.get("Last-Event-ID", -1)))
+    except ValueError:
+        return -1
+
+@bp.post("")
+def create():
+    """
+    Queue a render in the background; takes the same body as POST /api/v1/render
+
+    Response (202):
+    {
+        "jobId": "...",
+        "statusUrl": "/api/v1/jobs/<jobId>",
+        "eventsUrl": "/api/v1/jobs/<jobId>/events"
+    }
+
+    503 "queue_full" when JOB_QUEUE_SIZE jobs are already queued or running.
+    """
+    run, error = parse_render_request()
+    if error:
+        return error
+
+    def work(job: Job) -> None:
+        job.finish(**run(progress=job.progress))
+
+    try:
+        job = submit(work)
+    except QueueFull as e:
+        resp = jsonify(error={"code": "queue_full", "message": str(e)})
+        resp.headers["Retry-After"] = "5"
+        return resp, 503
+    return jsonify(jobId=job.id, statusUrl=f"/api/v1/jobs/{job.id}",
+                   eventsUrl=f"/api/v1/jobs/{job.id}/events"), 202
+
+@bp.get("/<job_id>")
+def status(job_id):
+    """
+    Poll a job
+
+    Response:
+    {
+        "jobId": "...",
+        "status": "queued" | "running" | "done" | "failed",
+        "stage": "decode" | "filter" | "compose" | "encode" | null,
+        "progress": {"decode": {"done": 2, "total": 4}, ...},
+        "stripId": "...", "previewUrl": "...",  # once done
+        "error": {"code": "...", "message": "..."}  # if failed
+    }
+    """
+    return jsonify(_job(job_id).to_dict())
+
+@bp.get("/<job_id>/events")
+def events(job_id):
+    """
+    Server-Sent Events for a job: "status", "progress" ({stage, done, total}),
+    then "done" (stripId, previewUrl) or "failed" (code, message). Events carry
+    ids, so a reconnecting EventSource resumes after Last-Event-ID.
+    """
+    job = _job(job_id)
+    start = _last_event_id() + 1
+
+    def stream():
+        for item in job.follow(start):
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            i, event, data = item
+            yield f"id: {i}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    resp = Response(stream(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
@@ -0,0 +1,108 @@
+from flask import Blueprint, request, jsonify
+from api.v1.uploads import int_param, read_json_frames
+from services.codec import InvalidImage
+from services.compose import DEFAULT_RESAMPLE, LAYOUTS, MAX_FRAMES, RESAMPLE_MODES, plan_canvas, resolve_layout
+from services.encode import negotiate_format
+from services.filters import FILTER_TYPES, list_backdrops
+from services.pipeline import Progress, render_strip
+from services.strip_store import content_id, preview_url, store_once
+
+bp = Blueprint("render", __name__, url_prefix="/api/v1")
+
+def _validate_filters(filters) -> str | None:
+    if not isinstance(filters, list):
+        return "filters must be an array"
+    for f in filters:
+        if not isinstance(f, dict) or f.get("type") not in FILTER_TYPES:
+            return "Invalid filter type"
+        if not (0.0 <= float(f.get("intensity", 1.0)) <= 2.0):
+            return "intensity must be between 0.0 and 2.0"
+        if f["type"] == "chromakey" and f.get("backdrop", "white") not in list_backdrops():
+            return "Unknown backdrop"
+    return None
+
+def _check_param(key: str, value) -> None:
+    """Reject bad filters / layout while the frames are still streaming in"""
+    message = _validate_filters(value) if key == "filters" else None
+    if key == "layout" and value not in LAYOUTS:
+        message = f"Unknown layout: {value}"
+    if message:
+        raise ValueError(message)
+
+def parse_render_request():
+    """
+    Read and validate a render body (see render below). Returns (run, None), where
+    run(progress=None) renders and stores the strip and returns the response
+    fields, or (None, error response).
+    """
+    try:
+        frames, data = read_json_frames("frames", validate=_check_param, max_frames=MAX_FRAMES)
+    except InvalidImage as e:
+        return None, (jsonify(error={"code": "invalid_image", "message": str(e)}), 400)
+    except (TypeError, ValueError) as e:
+        return None, (jsonify(error={"code": "bad_request", "message": str(e)}), 400)
+    filters = data.get("filters", [])
+    layout = data.get("layout", "vertical")
+    resample = data.get("resample", DEFAULT_RESAMPLE)
+
+    if not isinstance(frames, list):
+        return None, (jsonify(error={"code": "bad_request", "message": "frames array is required"}), 400)
+    try:
+        rows, cols = int_param(data, "rows", minimum=1), int_param(data, "cols", minimum=1)
+        frame_width, padding = int_param(data, "frameWidth", minimum=1), int_param(data, "padding", 16, minimum=0)
+        template = resolve_layout(layout, len(frames), rows, cols)
+        message = _validate_filters(filters)
+        if not message:
+            plan_canvas(frames, template, frame_width, padding)
+        fmt, quality = negotiate_format(request.accept_mimetypes, data.get("format"), data.get("quality"))
+    except (TypeError, ValueError) as e:
+        message = str(e)
+    if message:
+        return None, (jsonify(error={"code": "bad_request", "message": message}), 400)
+    if resample not in RESAMPLE_MODES:
+        return None, (jsonify(error={"code": "bad_request", "message": "resample must be 'fast' or 'quality'"}), 400)
+
+    def run(progress: Progress | None = None) -> dict:
+        sid = content_id(frames, layout=template, frameWidth=frame_width, padding=padding,
+                         resample=resample, filters=filters or None)
+        sid = store_once(sid, lambda: render_strip(frames, filters, layout, template.rows, template.cols,
+                                                   frame_width=frame_width, padding=padding,
+                                                   resample=resample, progress=progress))
+        return {"stripId": sid, "previewUrl": preview_url(sid, fmt, quality)}
+
+    return run, None
+
+@bp.post("/render")
+def render():
+    """
+    Decode, filter, compose and store a strip in one call
+
+    Request body:
+    {
+        "frames": ["data:image/png;base64,...", ...],
+        "filters": [{"type": "sepia", "intensity": 1.0}, ...],  # Optional, applied in order
+        "layout": "vertical",  # Optional, see /strips/compose
+        "rows": 2, "cols": 2,  # Optional
+        "frameWidth": 600,  # Optional
+        "padding": 16,  # Optional
+        "resample": "fast" | "quality",  # Optional
+        "format": "png" | "jpeg" | "webp", "quality": 80  # Optional, format of previewUrl
+    }
+
+    Response:
+    {
+        "stripId": "...",
+        "previewUrl": "/api/v1/strips/preview/..."
+    }
+
+    For large batches, POST the same body to /api/v1/jobs to render in the background.
+    """
+    run, error = parse_render_request()
+    if error:
+        return error
+    try:
+        return jsonify(run())
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify(error={"code": "processing_error", "message": str(e)}), 500
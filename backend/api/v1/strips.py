@@ -1,30 +1,241 @@
-import os, uuid
-from flask import Blueprint, request, jsonify, send_file, abort
-from services.compose import compose_vertical_strip
+import os
+from flask import Blueprint, Response, request, jsonify, send_file, abort
+from api.v1.uploads import int_param, read_frames, read_json_frames
+from services import metrics
+from services.burst import MAX_BURST, pick_sharpest
+from services.codec import FrameHandle, InvalidImage
+from services.compose import (
+    DEFAULT_RESAMPLE, LAYOUTS, MAX_FRAMES, RESAMPLE_MODES, plan_canvas, resolve_layout, stream_layout,
+)
+from services.encode import mimetype, negotiate_format
+from services.printer import FileSink, check_print_options, iter_escpos
+from services.renditions import RENDITIONS
+from services.strip_store import (
+    content_id, ensure_transcoded, mark_served, preview_url, store, store_once, strip_key, strip_tier,
+    valid_strip_id,
+)
 
 bp = Blueprint("strips", __name__, url_prefix="/api/v1/strips")
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-TMP_DIR = os.path.abspath(os.environ.get("TMP_DIR", os.path.join(BASE_DIR, "backend", "tmp")))
-os.makedirs(TMP_DIR, exist_ok=True)
+PREVIEW_MAX_AGE = int(os.environ.get("PREVIEW_MAX_AGE", 365 * 24 * 3600))
+
+def _strip_key(strip_id: str) -> str:
+    if not valid_strip_id(strip_id):
+        abort(404)
+    key = strip_key(strip_id)
+    if not store.exists(key):
+        abort(404)
+    return key
+
+def _send_stored(key: str, mime: str, max_age: int) -> Response:
+    """send_file from local disk when the backend has a path, else from the object stream"""
+    path = store.path(key)
+    if path:
+        return send_file(path, mimetype=mime, max_age=max_age, conditional=True, etag=True)
+    st = store.stat(key)
+    if st is None:
+        abort(404)
+    return send_file(store.get(key), mimetype=mime, max_age=max_age, conditional=True,
+                     etag=st.etag, last_modified=st.mtime)
+
+def _check_layout(key: str, value) -> None:
+    if key == "layout" and value not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {value}")
+    if key == "resample" and value not in RESAMPLE_MODES:
+        raise ValueError("resample must be 'fast' or 'quality'")
+
+def _print_options(src) -> dict:
+    """Validated before the strip is opened, so a bad option never leaves its stream open"""
+    options = {
+        "paper_mm": int(src.get("paper", 58)),
+        "dither": src.get("dither", "floyd-steinberg"),
+    }
+    check_print_options(**options)
+    return options
 
 @bp.post("/compose")
 def compose():
-    data = request.get_json(force=True) or {}
-    frames = data.get("frames")
-    frame_width = data.get("frameWidth")
-    padding = data.get("padding", 16)
-    if not isinstance(frames, list) or len(frames) != 4:
-        return jsonify(error={"code": "bad_request", "message": "Exactly 4 frames are required"}), 400
-    img = compose_vertical_strip(frames, frame_width=frame_width, padding=padding)
-    sid = str(uuid.uuid4())
-    out_path = os.path.join(TMP_DIR, f"{sid}.png")
-    img.save(out_path, format="PNG", optimize=True)
-    return jsonify(stripId=sid, previewUrl=f"/api/v1/strips/preview/{sid}")
+    """
+    Compose frames into a strip or print sheet
+
+    Request body:
+    {
+        "frames": ["data:image/png;base64,...", ...],
+        "layout": "vertical" | "horizontal" | "grid2x2" | "grid" | "double-strip",  # Optional, default vertical
+        "rows": 2, "cols": 3,  # Optional, for "grid"
+        "frameWidth": 600,  # Optional
+        "padding": 16,  # Optional
+        "resample": "fast" | "quality",  # Optional
+        "format": "png" | "jpeg" | "webp", "quality": 80  # Optional, format of previewUrl
+    }
+
+    Frames can also be uploaded as multipart/form-data ("frames" file parts) or as an
+    application/octet-stream body (see api/v1/uploads.py), with the other fields as
+    form fields / query params.
+
+    The stripId is a hash of the frames and parameters: repeating a request returns
+    the strip already stored, without composing it again.
+    """
+    try:
+        frames, data = read_frames("frames", validate=_check_layout, max_frames=MAX_FRAMES)
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    layout = data.get("layout", "vertical")
+    resample = data.get("resample", DEFAULT_RESAMPLE)
+    if not isinstance(frames, list):
+        return jsonify(error={"code": "bad_request", "message": "frames array is required"}), 400
+    try:
+        rows, cols = int_param(data, "rows", minimum=1), int_param(data, "cols", minimum=1)
+        frame_width, padding = int_param(data, "frameWidth", minimum=1), int_param(data, "padding", 16, minimum=0)
+        template = resolve_layout(layout, len(frames), rows, cols)
+        fmt, quality = negotiate_format(request.accept_mimetypes, data.get("format"), data.get("quality"))
+    except (TypeError, ValueError) as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    if resample not in RESAMPLE_MODES:
+        return jsonify(error={"code": "bad_request", "message": "resample must be 'fast' or 'quality'"}), 400
+    try:
+        frames = [FrameHandle.open(f) for f in frames]
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    try:
+        plan_canvas(frames, template, frame_width, padding)
+    except ValueError as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    # Same frames + same parameters = same strip; repeats return the stored one
+    sid = content_id(frames, layout=template, frameWidth=frame_width, padding=padding, resample=resample)
+    sid = store_once(sid, lambda: stream_layout(frames, layout, rows, cols,
+                                                frame_width=frame_width, padding=padding, resample=resample))
+    return jsonify(stripId=sid, previewUrl=preview_url(sid, fmt, quality))
+
+@bp.post("/burst")
+def burst():
+    """
+    Compose a strip from burst captures, keeping the sharpest frame of each slot
+
+    Request body:
+    {
+        "slots": [["data:image/jpeg;base64,...", ...], ...],  # 4 slots, 1-5 candidates each; JPEG scores fastest
+        "frameWidth": 600,  # Optional
+        "padding": 16,  # Optional
+        "resample": "fast" | "quality",  # Optional
+        "format": "png" | "jpeg" | "webp", "quality": 80  # Optional, format of previewUrl
+    }
+    """
+    try:
+        slots, data = read_json_frames("slots", validate=_check_layout, max_frames=4)
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    if not isinstance(slots, list) or len(slots) != 4:
+        return jsonify(error={"code": "bad_request", "message": "Exactly 4 slots are required"}), 400
+    if not all(isinstance(s, list) and 1 <= len(s) <= MAX_BURST for s in slots):
+        return jsonify(error={"code": "bad_request", "message": f"Each slot needs 1 to {MAX_BURST} frames"}), 400
+    resample = data.get("resample", DEFAULT_RESAMPLE)
+    if resample not in RESAMPLE_MODES:
+        return jsonify(error={"code": "bad_request", "message": "resample must be 'fast' or 'quality'"}), 400
+    try:
+        frame_width, padding = int_param(data, "frameWidth", minimum=1), int_param(data, "padding", 16, minimum=0)
+        fmt, quality = negotiate_format(request.accept_mimetypes, data.get("format"), data.get("quality"))
+    except (TypeError, ValueError) as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    try:
+        winners, scores = pick_sharpest(slots)
+    except InvalidImage as e:
+        return jsonify(error={"code": "invalid_image", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify(error={"code": "processing_error", "message": str(e)}), 400
+    frames = [slot[i] for slot, i in zip(slots, winners)]
+    template = resolve_layout("vertical", len(frames))
+    try:
+        plan_canvas(frames, template, frame_width, padding)
+    except ValueError as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    sid = content_id(frames, layout=template, frameWidth=frame_width, padding=padding, resample=resample)
+    sid = store_once(sid, lambda: stream_layout(frames, frame_width=frame_width, padding=padding, resample=resample))
+    return jsonify(stripId=sid, previewUrl=preview_url(sid, fmt, quality), selected=winners, scores=scores)
 
 @bp.get("/preview/<strip_id>")
 def preview(strip_id):
-    fn = os.path.join(TMP_DIR, f"{strip_id}.png")
-    if not os.path.isfile(fn):
-        abort(404)
-    return send_file(fn, mimetype="image/png", as_attachment=False, max_age=0)
+    """
+    Serve a strip, or one of its renditions
+
+    Query: ?size=full|social|thumb|placeholder (see STRIP_RENDITIONS)
+           &format=png|jpeg|webp&quality=1-100 (otherwise negotiated from Accept, PNG by default)
+    """
+    size = request.args.get("size", "full")
+    if size != "full" and size not in RENDITIONS:
+        return jsonify(error={"code": "bad_request", "message": "Unknown size"}), 400
+    try:
+        fmt, quality = negotiate_format(request.accept_mimetypes, request.args.get("format"), request.args.get("quality"))
+    except ValueError as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    key = _strip_key(strip_id)
+    # Strips already smaller than a rendition have no file for it; the full strip stands in
+    if store.exists(strip_key(strip_id, size)):
+        key = strip_key(strip_id, size)
+    if fmt == "png":
+        tier = strip_tier(strip_id)
+        metrics.inc(f"preview.{tier}")
+    else:
+        key = ensure_transcoded(key, strip_id, size, fmt, quality)
+        metrics.inc(f"preview.{fmt}")
+    # A fast-tier PNG is replaced once the optimizer has recompressed it, so it is only
+    # cached with revalidation. So is an "unknown" one: after a restart, or in another
+    # worker, there is no telling whether the optimizer is still due to rewrite it.
+    # Only a PNG known to be optimized, and transcodes, are never rewritten and immutable.
+    # send_file answers If-None-Match / Range against a strong ETag of the stored object.
+    mutable = fmt == "png" and tier != "optimized"
+    resp = _send_stored(key, mimetype(fmt), 0 if mutable else PREVIEW_MAX_AGE)
+    resp.cache_control.public = True
+    resp.cache_control.no_cache = True if mutable else None
+    resp.cache_control.immutable = not mutable
+    if fmt == "png":
+        resp.headers["X-Strip-Tier"] = tier
+    if "format" not in request.args:
+        resp.vary.add("Accept")
+    mark_served(strip_id)
+    return resp
+
+@bp.get("/escpos/<strip_id>")
+def escpos(strip_id):
+    """
+    Stream a strip as ESC/POS raster commands for a thermal printer
+
+    Query: ?paper=58|80&dither=floyd-steinberg|ordered
+    """
+    key = _strip_key(strip_id)
+    try:
+        options = _print_options(request.args)
+    except ValueError as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    # The generator closes the stored strip once it has been read
+    return Response(iter_escpos(store.get(key), **options), mimetype="application/octet-stream")
+
+@bp.post("/print/<strip_id>")
+def print_strip(strip_id):
+    """
+    Send a strip to the kiosk printer configured by PRINTER_DEVICE
+
+    Request body (optional):
+    {
+        "paper": 58 | 80,
+        "dither": "floyd-steinberg" | "ordered"
+    }
+    """
+    device = os.environ.get("PRINTER_DEVICE")
+    if not device:
+        return jsonify(error={"code": "printer_unavailable", "message": "No printer configured"}), 503
+    key = _strip_key(strip_id)
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        options = _print_options(data)
+        with store.get(key) as fh:
+            written = FileSink(device).write(iter_escpos(fh, **options))
+    except ValueError as e:
+        return jsonify(error={"code": "bad_request", "message": str(e)}), 400
+    except OSError as e:
+        return jsonify(error={"code": "printer_error", "message": str(e)}), 502
+    return jsonify(printed=True, bytes=written)
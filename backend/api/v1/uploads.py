@@ -0,0 +1,95 @@
+from typing import Any, Callable, Dict, List, Tuple
+from flask import request
+from services.codec import FrameHandle
+from services.jsonstream import iter_object
+
+Validator = Callable[[str, Any], None]
+
+def _frame(value) -> FrameHandle | List[FrameHandle]:
+    """A streamed array element: a data URL, or a nested array of them (burst slots)"""
+    if isinstance(value, list):
+        return [_frame(v) for v in value]
+    if not isinstance(value, (bytes, str)):
+        raise ValueError("Frames must be base64 data URLs")
+    return FrameHandle.open(value)
+
+def read_json_frames(
+    field: str,
+    validate: Validator | None = None,
+    max_frames: int | None = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Parse a JSON body incrementally from the request stream. Each element of the
+    <field> array is opened as a FrameHandle as soon as it has arrived, so its data
+    URL is dropped right away; every other member is passed to `validate(key, value)`
+    as it is read. A ValueError from either (including a bad image or more than
+    `max_frames` frames) aborts before the rest of the body is read - clients that
+    send params ahead of the frames get rejected without uploading them.
+    """
+    data: Dict[str, Any] = {}
+    for kind, key, value in iter_object(request.stream, stream_keys=(field,)):
+        if kind == "item":
+            if max_frames is not None and len(data[key]) >= max_frames:
+                raise ValueError(f"At most {max_frames} {field} are allowed")
+            data[key].append(_frame(value))
+            continue
+        data[key] = value
+        if validate and key != field:
+            validate(key, value)
+    return data.get(field), data
+
+def read_frames(
+    field: str,
+    validate: Validator | None = None,
+    max_frames: int | None = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Frames and parameters of a frame-accepting request, in any of the supported encodings:
+
+    - application/json: {"<field>": ["data:image/...;base64,...", ...], ...params}
+    - multipart/form-data: one file part per frame under <field>, params as form fields
+    - application/octet-stream: frames back to back in the body, their byte lengths in
+      the X-Frame-Lengths header (comma separated, may be omitted for a single frame),
+      params in the query string
+
+    Binary frames are handed on as upload streams / memoryview slices, never re-encoded.
+    JSON bodies are parsed as they stream in (see read_json_frames); `validate` and
+    `max_frames` only apply there, the other encodings are checked by the view.
+    """
+    if request.mimetype == "multipart/form-data":
+        return [f.stream for f in request.files.getlist(field)], request.form.to_dict()
+    if request.mimetype == "application/octet-stream":
+        body = memoryview(request.get_data())
+        lengths = request.headers.get("X-Frame-Lengths")
+        sizes = [int(n) for n in lengths.split(",")] if lengths else [len(body)]
+        if sum(sizes) != len(body) or min(sizes) <= 0:
+            raise ValueError("X-Frame-Lengths does not match the request body")
+        frames: List[memoryview] = []
+        offset = 0
+        for n in sizes:
+            frames.append(body[offset:offset + n])
+            offset += n
+        return frames, request.args.to_dict()
+    return read_json_frames(field, validate, max_frames)
+
+def int_param(
+    data: Dict[str, Any],
+    key: str,
+    default: int | None = None,
+    minimum: int | None = None,
+    maximum: int | None = None,
+) -> int | None:
+    """
+    Form and query params arrive as strings; JSON ones may already be numbers.
+    Raises ValueError for a value outside [minimum, maximum].
+    """
+    value = data.get(key, default)
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{key} must be an integer")
+    value = int(value)
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f"{key} must be between {minimum} and {maximum}" if maximum is not None
+                         else f"{key} must be at least {minimum}")
+    return value
@@ -1,12 +1,15 @@
-import os, glob, time
+import os
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 from werkzeug.exceptions import HTTPException
+from services.json_provider import install_json_provider
 
 def create_app():
     load_dotenv()
     app = Flask(__name__)
+    install_json_provider(app)
     CORS(app, resources={r"/api/*": {"origins": os.getenv("ALLOWED_ORIGINS", "http://localhost:5173")}})
     app.config["MAX_CONTENT_LENGTH"] = 10 * 1024 * 1024
 
@@ -14,12 +17,32 @@ def create_app():
     def health():
         return jsonify(status="ok", version="0.1.0")
 
+    @app.get("/api/metrics")
+    def metrics_view():
+        from services import metrics
+        return jsonify(metrics.snapshot())
+
     from api.v1.strips import bp as strips_bp
     from api.v1.filters import bp as filters_bp
     from api.v1.photos import bp as photos_bp
+    from api.v1.render import bp as render_bp
+    from api.v1.jobs import bp as jobs_bp
     app.register_blueprint(strips_bp)
     app.register_blueprint(filters_bp)
     app.register_blueprint(photos_bp)
+    app.register_blueprint(render_bp)
+    app.register_blueprint(jobs_bp)
+
+    from api.v1.filters import TMP_DIR as results_dir
+    from services.janitor import start_janitor
+    from services.strip_store import store
+    janitor_roots = [root for root in (store.root, results_dir) if root]
+
+    @app.before_request
+    def start_tmp_janitor():
+        # Started by the first request a server handles, so CLI commands such as
+        # `flask cleanup` never run a janitor alongside their own sweep
+        start_janitor(janitor_roots)
 
     @app.errorhandler(HTTPException)
     def http_err(e):
@@ -31,14 +54,28 @@ def create_app():
         return jsonify(error={"code": "internal_error", "message": "Something went wrong"}), 500
 
     @app.cli.command("cleanup")
-    def cleanup():
-        tmp_dir = os.environ.get("TMP_DIR", os.path.join(os.path.dirname(__file__), "tmp"))
-        now = time.time()
-        removed = 0
-        for p in glob.glob(os.path.join(tmp_dir, "*.png")):
-            if now - os.path.getmtime(p) > 24 * 3600:
-                os.remove(p); removed += 1
-        print(f"Removed {removed} files")
+    @click.option("--scan", is_flag=True, help="Also stat every file, for files written before the expiry index existed")
+    def cleanup(scan):
+        """Delete expired strips and filter results from every tmp directory"""
+        from api.v1.filters import TMP_DIR as results_dir
+        from services.expiry import expiry_index, scan_expired
+        from services.strip_store import STRIP_TTL, store
+        removed = reclaimed = 0
+        for root in sorted({root for root in (store.root, results_dir) if root}):
+            files, size = expiry_index(root).sweep()
+            if scan:
+                more_files, more_size = scan_expired(root, STRIP_TTL)
+                files, size = files + more_files, size + more_size
+            print(f"{root}: removed {files} files, {size / 1024 / 1024:.1f} MiB")
+            removed += files
+            reclaimed += size
+        print(f"Removed {removed} files, reclaimed {reclaimed / 1024 / 1024:.1f} MiB")
+
+    @app.cli.command("migrate-tmp")
+    def migrate_tmp():
+        """Move strips from the old flat tmp layout into tmp/ab/cd/ shards"""
+        from services.strip_store import migrate_flat_layout
+        print(f"Moved {migrate_flat_layout()} files")
 
     return app
 
@@ -0,0 +1,55 @@
+"""
+Time burst scoring (services.burst.pick_sharpest) for a full burst: 4 slots of
+5 candidates at 1280x720, one sharp and four motion-blurred per slot, as the
+FrameHandles the endpoint hands over after parsing. Each format is timed
+separately because decoding dominates and only JPEG can be scaled in the DCT domain.
+
+    cd backend && python bench/bench_burst.py [iterations]
+"""
+import io, os, sys, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image, ImageFilter
+from services.burst import BURST_WORKERS, MAX_BURST, pick_sharpest
+from services.codec import FrameHandle
+
+SIZE = (1280, 720)
+
+def _scene(seed: int) -> Image.Image:
+    """Camera-like content: smooth gradients with fine detail and a little sensor noise"""
+    detail = Image.effect_mandelbrot(SIZE, (-2.0 + seed * 0.01, -1.0, 1.0, 1.0), 100)
+    noise = Image.effect_noise(SIZE, 8)
+    r = Image.blend(Image.linear_gradient("L").resize(SIZE), detail, 0.5)
+    return Image.merge("RGB", (r, Image.blend(detail, noise, 0.2), Image.radial_gradient("L").resize(SIZE)))
+
+def _burst(fmt: str):
+    slots = []
+    for slot in range(4):
+        sharp = _scene(slot)
+        candidates = []
+        for i in range(MAX_BURST):
+            # Candidate (slot % MAX_BURST) is the sharp one; the rest are blurred
+            blur = abs(i - slot % MAX_BURST) * 1.5
+            img = sharp.filter(ImageFilter.BoxBlur(blur)) if blur else sharp
+            buf = io.BytesIO()
+            img.save(buf, format=fmt, **({"quality": 90} if fmt != "PNG" else {}))
+            candidates.append(FrameHandle.open(buf.getvalue()))
+        slots.append(candidates)
+    return slots
+
+def main(iterations=10):
+    print(f"{4 * MAX_BURST} candidates at {SIZE[0]}x{SIZE[1]}, {BURST_WORKERS} scoring worker(s)")
+    for fmt in ("JPEG", "WEBP", "PNG"):
+        slots = _burst(fmt)
+        winners, _ = pick_sharpest(slots)  # warm up
+        assert winners == [slot % MAX_BURST for slot in range(4)], winners
+        start = time.perf_counter()
+        for _ in range(iterations):
+            pick_sharpest(slots)
+        elapsed = (time.perf_counter() - start) / iterations
+        kib = sum(len(c.raw) for s in slots for c in s) / 1024
+        print(f"{fmt:5} ({kib:6.0f} KiB): {elapsed * 1000:6.1f} ms per burst")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,62 @@
+"""
+Compare the stdlib JSON provider with the orjson-backed one on realistic response
+payloads: four filtered frames as data URLs (filters/apply) and a user's strip
+history (photos/user/<id>).
+
+    cd backend && python bench/bench_json.py [iterations]
+"""
+import base64, io, os, sys, time, uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from PIL import Image
+from services.json_provider import FastJSONProvider, orjson
+
+def _data_url(size=(1280, 720), seed=40, fmt="PNG") -> str:
+    buf = io.BytesIO()
+    Image.effect_noise(size, seed).convert("RGB").save(buf, format=fmt)
+    return f"data:image/{fmt.lower()};base64," + base64.b64encode(buf.getvalue()).decode()
+
+def _payloads():
+    frames = [_data_url(seed=40 + i) for i in range(4)]
+    thumbs = [_data_url((640, 360), seed=60 + i, fmt="JPEG") for i in range(4)]
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    history = [{
+        "id": str(uuid.uuid4()),
+        "user_id": "firebase_user_id",
+        "photos": thumbs,
+        "filter_type": "sepia",
+        "created_at": (start + timedelta(minutes=i)).isoformat(),
+    } for i in range(50)]
+    return {
+        "filteredImages": {"filteredImages": frames},
+        "photoStrips": {"success": True, "photoStrips": history},
+    }
+
+def _time(app: Flask, payload, iterations: int) -> float:
+    with app.app_context():
+        app.json.response(payload)  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            app.json.response(payload)
+        return (time.perf_counter() - start) / iterations
+
+def main(iterations=20):
+    if orjson is None:
+        sys.exit("orjson is not installed; nothing to compare")
+    apps = {}
+    for name, cls in (("stdlib", DefaultJSONProvider), ("orjson", FastJSONProvider)):
+        apps[name] = Flask(__name__)
+        apps[name].json = cls(apps[name])
+    for label, payload in _payloads().items():
+        size = len(apps["stdlib"].json.dumps(payload))
+        times = {name: _time(app, payload, iterations) for name, app in apps.items()}
+        print(f"{label} ({size / 1024 / 1024:.1f} MiB): "
+              + ", ".join(f"{name} {t * 1000:7.2f} ms" for name, t in times.items())
+              + f"  ({times['stdlib'] / times['orjson']:.1f}x)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
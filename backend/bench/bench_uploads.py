@@ -0,0 +1,65 @@
+"""
+Compare per-request CPU time and peak Python memory of the frame upload encodings.
+Frames are composed at a small frameWidth so request parsing dominates.
+
+    cd backend && python bench/bench_uploads.py [iterations]
+"""
+import base64, io, json, os, sys, tempfile, time, tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("TMP_DIR", tempfile.mkdtemp(prefix="boothbuddy-bench-"))
+
+from flask import Flask
+from PIL import Image
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.test import encode_multipart
+from api.v1.filters import bp as filters_bp
+from api.v1.strips import bp as strips_bp
+
+def _frames(n=4, size=(1280, 720)):
+    out = []
+    for i in range(n):
+        buf = io.BytesIO()
+        Image.effect_noise(size, 40 + i).convert("RGB").save(buf, format="JPEG", quality=90)
+        out.append(buf.getvalue())
+    return out
+
+def _requests(frames):
+    """Request bodies are encoded once up front so only server-side work is measured"""
+    data_urls = ["data:image/jpeg;base64," + base64.b64encode(f).decode() for f in frames]
+    json_body = json.dumps({"frames": data_urls, "frameWidth": 320}).encode()
+    boundary, multipart_body = encode_multipart(MultiDict(
+        [("frameWidth", "320")] + [("frames", FileStorage(io.BytesIO(f), f"{i}.jpg")) for i, f in enumerate(frames)]
+    ))
+    raw_body = b"".join(frames)
+    lengths = ",".join(str(len(f)) for f in frames)
+    return {
+        "json": lambda c: c.post("/api/v1/strips/compose", data=json_body, content_type="application/json"),
+        "multipart": lambda c: c.post("/api/v1/strips/compose", data=multipart_body,
+                                      content_type=f"multipart/form-data; boundary={boundary}"),
+        "octet-stream": lambda c: c.post("/api/v1/strips/compose?frameWidth=320", data=raw_body,
+                                         content_type="application/octet-stream",
+                                         headers={"X-Frame-Lengths": lengths}),
+    }
+
+def main(iterations=10):
+    app = Flask(__name__)
+    app.register_blueprint(filters_bp)
+    app.register_blueprint(strips_bp)
+    client = app.test_client()
+    frames = _frames()
+    print(f"{len(frames)} frames, {sum(map(len, frames)) / 1024:.0f} KiB encoded, {iterations} iterations")
+    for name, send in _requests(frames).items():
+        send(client)  # warm up
+        tracemalloc.start()
+        cpu = time.thread_time()
+        for _ in range(iterations):
+            resp = send(client)
+            assert resp.status_code == 200, resp.get_data(as_text=True)
+        cpu = (time.thread_time() - cpu) / iterations
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>13}: {cpu * 1000:7.1f} ms CPU/request, peak {peak / 1024 / 1024:6.1f} MiB")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,31 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from PIL import ImageFilter, ImageStat
+from services.codec import FrameHandle
+
+MAX_BURST = 5
+# Candidates are scored on a luma plane about this many pixels wide, whatever their size
+SCORE_WIDTH = 160
+# Pillow releases the GIL while decoding and filtering, so candidates score in parallel
+BURST_WORKERS = int(os.environ.get("BURST_WORKERS", min(4, os.cpu_count() or 1)))
+
+# 4-neighbour Laplacian; scale/offset keep the response inside 8 bits
+_LAPLACIAN = ImageFilter.Kernel((3, 3), (0, 1, 0, 1, -4, 1, 0, 1, 0), scale=2, offset=128)
+_pool = ThreadPoolExecutor(max_workers=BURST_WORKERS, thread_name_prefix="burst-score") if BURST_WORKERS > 1 else None
+
+def sharpness(frame) -> float:
+    """Variance of the Laplacian; higher means less motion blur"""
+    frame = FrameHandle.open(frame)
+    # Decoded straight to a ~160 px luma plane: 1/8 DCT scaling for a 1280 px JPEG, reduce() otherwise
+    luma = frame.decode((SCORE_WIDTH, max(1, frame.height * SCORE_WIDTH // frame.width)), mode="L")
+    lap = luma.filter(_LAPLACIAN)
+    return ImageStat.Stat(lap).var[0]
+
+def pick_sharpest(slots: List[List]) -> Tuple[List[int], List[List[float]]]:
+    """Return the index of the sharpest candidate in each slot, plus all scores"""
+    frames = [frame for candidates in slots for frame in candidates]
+    flat = iter(_pool.map(sharpness, frames) if _pool else map(sharpness, frames))
+    scores = [[next(flat) for _ in candidates] for candidates in slots]
+    winners = [max(range(len(s)), key=s.__getitem__) for s in scores]
+    return winners, scores
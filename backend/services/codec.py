@@ -0,0 +1,129 @@
+import io, os, binascii, hashlib
+from typing import Tuple
+from PIL import Image, UnidentifiedImageError
+
+ALLOWED_FORMATS = {"PNG", "JPEG", "WEBP"}
+MAX_FRAME_PIXELS = int(os.environ.get("MAX_FRAME_PIXELS", 25_000_000))
+MAX_FRAME_SIDE = int(os.environ.get("MAX_FRAME_SIDE", 10_000))
+# Modes Image.reduce() accepts; others (P, 1, I;16, ...) are converted first
+REDUCE_MODES = {"L", "LA", "RGB", "RGBA", "CMYK"}
+
+class InvalidImage(ValueError):
+    """Input that is not an acceptable image; raised before any pixel data is decoded"""
+
+def decode_base64(data_url) -> bytes:
+    """
+    Raw bytes of a base64 data URL. The payload is sliced from a memoryview and fed
+    to binascii directly, so a bytes input is never copied and a str input only once.
+    """
+    if isinstance(data_url, str):
+        try:
+            data_url = data_url.encode("ascii")
+        except UnicodeEncodeError:
+            raise InvalidImage("Invalid data URL: non-ASCII characters")
+    buf = memoryview(data_url)
+    comma = bytes(buf[:256]).find(b",")
+    if comma < 0:
+        raise InvalidImage("Invalid data URL")
+    try:
+        return binascii.a2b_base64(buf[comma + 1:])
+    except binascii.Error as e:
+        raise InvalidImage(f"Invalid base64 data: {e}")
+
+def _is_data_url(src) -> bool:
+    return isinstance(src, str) or (isinstance(src, (bytes, bytearray)) and src[:5] == b"data:")
+
+def open_image(src) -> Image.Image:
+    """
+    Open an image lazily and validate it from its header alone: format and
+    dimensions are checked before a single pixel is decoded.
+
+    `src` is a base64 data URL (str or bytes), raw encoded bytes or a binary file object.
+    """
+    if _is_data_url(src):
+        src = decode_base64(src)
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    try:
+        img = Image.open(src, formats=sorted(ALLOWED_FORMATS))
+    except UnidentifiedImageError:
+        raise InvalidImage(f"Unsupported or corrupt image (allowed: {', '.join(sorted(ALLOWED_FORMATS))})")
+    except Image.DecompressionBombError as e:
+        raise InvalidImage(str(e))
+    w, h = img.size
+    if w < 1 or h < 1 or max(w, h) > MAX_FRAME_SIDE or w * h > MAX_FRAME_PIXELS:
+        raise InvalidImage(f"Image dimensions {w}x{h} exceed the allowed size")
+    return img
+
+def load_scaled(img: Image.Image, target: Tuple[int, int] | None = None, mode: str = "RGBA") -> Image.Image:
+    """
+    Decode an opened image to `mode`, downsampling as early as possible when a smaller
+    target is known: JPEG is scaled in the DCT domain by draft(), anything else is
+    reduce()d straight after decode. The mode conversion comes after the reduce when
+    reduce() supports the decoded mode; palette, 1-bit, 16-bit and colour-keyed
+    images are converted first so their transparency survives.
+    """
+    if target:
+        if img.format == "JPEG":
+            img.draft("L" if mode == "L" else "RGB", target)
+        factor = min(img.width // target[0], img.height // target[1])
+        if factor >= 2:
+            if img.mode not in REDUCE_MODES or "transparency" in img.info:
+                img = img.convert(mode)
+            img = img.reduce(factor)
+    return img.convert(mode)
+
+def decode_image(src, target: Tuple[int, int] | None = None, mode: str = "RGBA") -> Image.Image:
+    if isinstance(src, FrameHandle):
+        return src.decode(target, mode)
+    return load_scaled(open_image(src), target, mode)
+
+class FrameHandle:
+    """
+    An encoded frame plus its header metadata. Sizing, validation and cache keys
+    only need the header and the raw bytes; pixels are decoded on first use.
+    """
+    __slots__ = ("raw", "size", "mode", "format", "_digest")
+
+    def __init__(self, raw, size: Tuple[int, int], mode: str, fmt: str):
+        self.raw = raw
+        self.size = size
+        self.mode = mode
+        self.format = fmt
+        self._digest: str | None = None
+
+    @classmethod
+    def open(cls, src) -> "FrameHandle":
+        """Accepts the same sources as open_image; upload streams are read into memory once"""
+        if isinstance(src, FrameHandle):
+            return src
+        if _is_data_url(src):
+            raw = decode_base64(src)
+        elif isinstance(src, (bytes, bytearray, memoryview)):
+            raw = src
+        else:
+            raw = src.read()
+        img = open_image(raw)
+        return cls(raw, img.size, img.mode, img.format)
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def digest(self) -> str:
+        """Content hash of the encoded bytes, computed on first access"""
+        if self._digest is None:
+            self._digest = hashlib.blake2b(self.raw, digest_size=16).hexdigest()
+        return self._digest
+
+    def decode(self, target: Tuple[int, int] | None = None, mode: str = "RGBA") -> Image.Image:
+        """Decode (downscaled towards `target` if given) without caching the result"""
+        return load_scaled(Image.open(io.BytesIO(self.raw)), target, mode)
+
+    def __repr__(self) -> str:
+        return f"<FrameHandle {self.format} {self.size[0]}x{self.size[1]} {self.mode}>"
@@ -1,36 +1,196 @@
-import io, base64
-from typing import List, Tuple
+import os
+from functools import lru_cache
+from typing import Callable, Iterator, List, NamedTuple, Tuple
 from PIL import Image
+from services.codec import MAX_FRAME_PIXELS, FrameHandle
 
-def _decode_data_url(data_url: str) -> Image.Image:
-    if "," not in data_url:
-        raise ValueError("Invalid data URL")
-    _, b64 = data_url.split(",", 1)
-    raw = base64.b64decode(b64)
-    return Image.open(io.BytesIO(raw)).convert("RGBA")
+# name -> (resampling filter, reducing_gap); "fast" lets Pillow pre-shrink with reduce()
+RESAMPLE_MODES = {
+    "fast": (Image.Resampling.BILINEAR, 2.0),
+    "quality": (Image.Resampling.BICUBIC, None),
+}
+DEFAULT_RESAMPLE = os.environ.get("COMPOSE_RESAMPLE", "quality")
+MAX_FRAMES = 12
+BAND_ROWS = 64
+MAX_FRAME_WIDTH = int(os.environ.get("MAX_FRAME_WIDTH", 4096))
+MAX_PADDING = 512
+# Strips are transcoded and turned into renditions as whole images: keep them decodable
+# without Pillow's decompression-bomb guard, and within WebP's 16383 px side limit
+MAX_CANVAS_PIXELS = int(os.environ.get("MAX_CANVAS_PIXELS", 50_000_000))
+MAX_CANVAS_SIDE = 16383
 
-def compose_vertical_strip(
-    frame_urls: List[str],
+class LayoutTemplate(NamedTuple):
+    """Grid of rows x cols frames (None = derived from the frame count), repeated `copies` times side by side"""
+    rows: int | None
+    cols: int | None
+    copies: int = 1
+
+LAYOUTS = {
+    "vertical": LayoutTemplate(rows=None, cols=1),
+    "horizontal": LayoutTemplate(rows=1, cols=None),
+    "grid2x2": LayoutTemplate(rows=2, cols=2),
+    "grid": LayoutTemplate(rows=None, cols=None),
+    "double-strip": LayoutTemplate(rows=None, cols=1, copies=2),
+}
+
+def plan_frame_sizes(sizes: List[Tuple[int, int]], frame_width: int | None = None) -> List[Tuple[int, int]]:
+    """
+    Final (w, h) of every frame: all scaled to frameWidth, or to the narrowest frame.
+    Raises ValueError for a frameWidth outside 1..MAX_FRAME_WIDTH or a frame that
+    would be upscaled beyond MAX_FRAME_PIXELS.
+    """
+    if frame_width is not None and not 1 <= frame_width <= MAX_FRAME_WIDTH:
+        raise ValueError(f"frameWidth must be between 1 and {MAX_FRAME_WIDTH}")
+    w = frame_width or min(fw for fw, _ in sizes)
+    planned = [(w, max(1, int(fh * w / fw))) for fw, fh in sizes]
+    if any(pw * ph > MAX_FRAME_PIXELS for pw, ph in planned):
+        raise ValueError(f"frameWidth {w} would scale a frame beyond {MAX_FRAME_PIXELS} pixels")
+    return planned
+
+def resize_frame(frame: Image.Image, size: Tuple[int, int], resample: str = DEFAULT_RESAMPLE) -> Image.Image:
+    """Resize in a single pass, using reduce() when the width shrinks by an integer factor"""
+    if frame.size == size:
+        return frame
+    if resample not in RESAMPLE_MODES:
+        raise ValueError(f"Unknown resample mode: {resample}")
+    w, h = size
+    factor = frame.width // w
+    if factor >= 2 and frame.width == w * factor and frame.height >= h * factor:
+        return frame.reduce(factor, box=(0, 0, w * factor, h * factor))
+    method, gap = RESAMPLE_MODES[resample]
+    return frame.resize(size, method, reducing_gap=gap)
+
+def resolve_layout(name: str, count: int, rows: int | None = None, cols: int | None = None) -> LayoutTemplate:
+    """Fill in a named template's open dimensions for `count` frames"""
+    if name not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {name}")
+    if not 1 <= count <= MAX_FRAMES:
+        raise ValueError(f"Between 1 and {MAX_FRAMES} frames are required")
+    template = LAYOUTS[name]
+    rows = template.rows or rows
+    cols = template.cols or cols
+    if not rows and not cols:
+        raise ValueError(f"Layout {name} needs rows or cols")
+    rows = int(rows or -(-count // cols))
+    cols = int(cols or -(-count // rows))
+    if rows < 1 or cols < 1 or rows * cols != count:
+        raise ValueError(f"Layout {name} ({rows}x{cols}) does not fit {count} frames")
+    return template._replace(rows=rows, cols=cols)
+
+def _offsets(lengths: List[int], padding: int) -> List[int]:
+    out, pos = [], 0
+    for n in lengths:
+        out.append(pos)
+        pos += n + padding
+    return out
+
+@lru_cache(maxsize=128)
+def layout_geometry(
+    template: LayoutTemplate,
+    sizes: Tuple[Tuple[int, int], ...],
+    padding: int,
+) -> Tuple[Tuple[int, int], Tuple[Tuple[int, int, int], ...]]:
+    """
+    Canvas size and (frame index, x, y) paste positions for a resolved template.
+    Column widths / row heights are the largest frame in that column / row.
+    """
+    rows, cols, copies = template
+    col_w = [max(sizes[r * cols + c][0] for r in range(rows)) for c in range(cols)]
+    row_h = [max(sizes[r * cols + c][1] for c in range(cols)) for r in range(rows)]
+    grid_w = sum(col_w) + padding * (cols - 1)
+    grid_h = sum(row_h) + padding * (rows - 1)
+    xs, ys = _offsets(col_w, padding), _offsets(row_h, padding)
+    slots = tuple(
+        (r * cols + c, k * (grid_w + padding) + xs[c], ys[r])
+        for k in range(copies) for r in range(rows) for c in range(cols)
+    )
+    return (copies * grid_w + padding * (copies - 1), grid_h), slots
+
+def plan_canvas(
+    frames: List[FrameHandle],
+    template: LayoutTemplate,
     frame_width: int | None = None,
     padding: int = 16,
-    bg: Tuple[int, int, int, int] = (255, 255, 255, 255),
-) -> Image.Image:
-    if len(frame_urls) != 4:
-        raise ValueError("Exactly 4 frames are required")
-    frames = [_decode_data_url(u) for u in frame_urls]
+) -> Tuple[int, int]:
+    """
+    Canvas size of a resolved layout, from the frame headers alone; raises ValueError
+    for a bad padding or a canvas over MAX_CANVAS_PIXELS / MAX_CANVAS_SIDE, so views
+    can reject a request before anything is decoded
+    """
+    if not 0 <= padding <= MAX_PADDING:
+        raise ValueError(f"padding must be between 0 and {MAX_PADDING}")
+    sizes = plan_frame_sizes([f.size for f in frames], frame_width)
+    (w, h), _ = layout_geometry(template, tuple(sizes), padding)
+    if w * h > MAX_CANVAS_PIXELS or max(w, h) > MAX_CANVAS_SIDE:
+        raise ValueError(f"The strip would be {w}x{h}, over the {MAX_CANVAS_PIXELS} pixel / "
+                         f"{MAX_CANVAS_SIDE} px limit; lower frameWidth or padding")
+    return w, h
 
-    if frame_width:
-        frames = [f.resize((frame_width, int(f.height * frame_width / f.width))) for f in frames]
+def open_frames(
+    frame_urls: List[str],
+    frame_width: int | None = None,
+    resample: str = DEFAULT_RESAMPLE,
+    transform: Callable[[Image.Image], Image.Image] | None = None,
+) -> Tuple[List[Tuple[int, int]], Callable[[int], Image.Image]]:
+    """
+    Read frame headers and plan output sizes without decoding any pixels.
+    Returns the sizes and a loader that decodes frame i at its planned size
+    (then runs `transform`, which must keep the size).
+    """
+    handles = [FrameHandle.open(u) for u in frame_urls]
+    sizes = plan_frame_sizes([h.size for h in handles], frame_width)
 
-    w = min(f.width for f in frames)
-    frames = [f.resize((w, int(f.height * w / f.width))) for f in frames]
+    def load(i: int) -> Image.Image:
+        frame = resize_frame(handles[i].decode(sizes[i]), sizes[i], resample)
+        return transform(frame) if transform else frame
 
-    total_h = sum(f.height for f in frames) + padding * 3
-    canvas = Image.new("RGBA", (w, total_h), bg)
+    return sizes, load
 
-    y = 0
-    for i, f in enumerate(frames):
-        canvas.paste(f, (0, y))
-        y += f.height + (padding if i < 3 else 0)
+def _iter_bands(
+    canvas_size: Tuple[int, int],
+    slots: Tuple[Tuple[int, int, int], ...],
+    sizes: List[Tuple[int, int]],
+    load: Callable[[int], Image.Image],
+    bg: Tuple[int, int, int, int],
+    band_rows: int,
+) -> Iterator[Image.Image]:
+    """Yield canvas bands top to bottom; frames are decoded on first use and dropped once passed"""
+    width, height = canvas_size
+    bottom = {}
+    for i, _, y in slots:
+        bottom[i] = max(bottom.get(i, 0), y + sizes[i][1])
+    live = {}
+    for y0 in range(0, height, band_rows):
+        y1 = min(height, y0 + band_rows)
+        band = Image.new("RGBA", (width, y1 - y0), bg)
+        for i, x, y in slots:
+            if y < y1 and y + sizes[i][1] > y0:
+                if i not in live:
+                    live[i] = load(i)
+                band.paste(live[i], (x, y - y0))
+        for i in [i for i in live if bottom[i] <= y1]:
+            del live[i]
+        yield band
 
-    return canvas.convert("RGBA")
+def stream_layout(
+    frame_urls: List[str],
+    layout: str = "vertical",
+    rows: int | None = None,
+    cols: int | None = None,
+    frame_width: int | None = None,
+    padding: int = 16,
+    bg: Tuple[int, int, int, int] = (255, 255, 255, 255),
+    resample: str = DEFAULT_RESAMPLE,
+    transform: Callable[[Image.Image], Image.Image] | None = None,
+    band_rows: int = BAND_ROWS,
+) -> Tuple[Tuple[int, int], Iterator[Image.Image]]:
+    """
+    Resolve a layout and return the canvas size and an iterator of its bands, top to
+    bottom; peak memory is one band plus the frames it crosses, never the full canvas.
+    """
+    template = resolve_layout(layout, len(frame_urls), rows, cols)
+    handles = [FrameHandle.open(u) for u in frame_urls]
+    plan_canvas(handles, template, frame_width, padding)
+    sizes, load = open_frames(handles, frame_width, resample, transform)
+    canvas_size, slots = layout_geometry(template, tuple(sizes), padding)
+    return canvas_size, _iter_bands(canvas_size, slots, sizes, load, bg, band_rows)
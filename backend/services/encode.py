@@ -0,0 +1,108 @@
+import io, zlib
+from typing import Iterable, Iterator, List, Tuple
+from PIL import Image, ImageChops, features
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COLOR_TYPES = {"RGB": 2, "RGBA": 6}
+PNG_FILTER_UP = b"\x02"
+
+# format -> (Pillow format, mime type, default quality)
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png", None),
+    "jpeg": ("JPEG", "image/jpeg", 85),
+    "webp": ("WEBP", "image/webp", 80),
+}
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+def available_formats() -> List[str]:
+    return [f for f in OUTPUT_FORMATS if f != "webp" or features.check("webp")]
+
+def negotiate_format(accept=None, fmt: str | None = None, quality=None) -> Tuple[str, int | None]:
+    """
+    Pick the output format and quality. An explicit `format` wins; otherwise
+    WebP, then JPEG, is used only when the Accept header names it outright
+    (wildcards don't count), so existing clients keep getting PNG.
+    """
+    formats = available_formats()
+    if fmt:
+        if not isinstance(fmt, str):
+            raise ValueError("format must be a string")
+        fmt = "jpeg" if fmt.lower() == "jpg" else fmt.lower()
+        if fmt not in formats:
+            raise ValueError(f"format must be one of: {', '.join(formats)}")
+    else:
+        fmt = "png"
+        named = {value for value, q in (accept or []) if q > 0}
+        for candidate in ("webp", "jpeg"):
+            if candidate in formats and OUTPUT_FORMATS[candidate][1] in named:
+                fmt = candidate
+                break
+    default_quality = OUTPUT_FORMATS[fmt][2]
+    if default_quality is None:
+        return fmt, None
+    quality = int(quality) if quality is not None else default_quality
+    if not 1 <= quality <= 100:
+        raise ValueError("quality must be between 1 and 100")
+    return fmt, quality
+
+def mimetype(fmt: str) -> str:
+    return OUTPUT_FORMATS[fmt][1]
+
+def save_image(image: Image.Image, fp, fmt: str = "png", quality: int | None = None) -> None:
+    """Save in a negotiated format; JPEG has no alpha, so RGBA is flattened onto white"""
+    pil_format = OUTPUT_FORMATS[fmt][0]
+    if fmt == "png":
+        image.save(fp, format=pil_format)
+        return
+    if fmt == "jpeg" and image.mode != "RGB":
+        if "A" in image.getbands():
+            flat = Image.new("RGB", image.size, (255, 255, 255))
+            flat.paste(image, mask=image.getchannel("A"))
+            image = flat
+        else:
+            image = image.convert("RGB")
+    image.save(fp, format=pil_format, quality=quality)
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(tag))
+    return len(data).to_bytes(4, "big") + tag + data + crc.to_bytes(4, "big")
+
+def iter_png(
+    size: Tuple[int, int],
+    bands: Iterable[Image.Image],
+    mode: str = "RGBA",
+    level: int = 6,
+) -> Iterator[bytes]:
+    """
+    Encode an image delivered as horizontal bands (top to bottom) into PNG chunks.
+
+    Rows use the PNG "Up" filter, computed per band with ImageChops.subtract_modulo,
+    so only the current band and its filtered copy are in memory at any time.
+    """
+    width, height = size
+    stride = width * len(mode)
+    yield PNG_SIGNATURE
+    yield _chunk(b"IHDR", width.to_bytes(4, "big") + height.to_bytes(4, "big")
+                 + bytes((8, PNG_COLOR_TYPES[mode], 0, 0, 0)))
+
+    comp = zlib.compressobj(level)
+    prev_row = Image.new(mode, (width, 1), 0)
+    for band in bands:
+        if band.mode != mode:
+            band = band.convert(mode)
+        above = Image.new(mode, band.size, 0)
+        above.paste(prev_row, (0, 0))
+        above.paste(band.crop((0, 0, width, band.height - 1)), (0, 1))
+        prev_row = band.crop((0, band.height - 1, width, band.height))
+        raw = memoryview(ImageChops.subtract_modulo(band, above).tobytes())
+        rows = PNG_FILTER_UP + PNG_FILTER_UP.join(raw[i:i + stride] for i in range(0, len(raw), stride))
+        data = comp.compress(rows)
+        if data:
+            yield _chunk(b"IDAT", data)
+    yield _chunk(b"IDAT", comp.flush())
+    yield _chunk(b"IEND", b"")
+
+def encode_image(image: Image.Image, fmt: str = "png", quality: int | None = None) -> bytes:
+    buffer = io.BytesIO()
+    save_image(image, buffer, fmt, quality)
+    return buffer.getvalue()
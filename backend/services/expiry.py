@@ -0,0 +1,137 @@
+import os, time, threading
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Tuple
+
+BUCKET_SECONDS = int(os.environ.get("EXPIRY_BUCKET_SECONDS", 3600))
+INDEX_DIR = ".expiry"
+
+class ExpiryIndex:
+    """
+    Time-bucketed expiry index for the files under one tmp root.
+
+    add() appends an entry to the bucket file covering its expiry time
+    (<root>/.expiry/<bucket>.idx); sweep() only opens buckets that are entirely
+    in the past, so a cleanup run costs O(expired entries), not O(files on disk).
+    An entry is a path relative to the root; it removes that file and every
+    sibling named "<entry>.*" (a strip together with its renditions and transcodes).
+
+    Each line also records the entry's TTL. An entry whose files were written or
+    touched less than TTL seconds ago is left alone, so a bucket line from an
+    earlier write never deletes a strip that was re-created or refreshed since;
+    the later write added its own line to a later bucket.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dir = os.path.join(root, INDEX_DIR)
+        self._lock = threading.Lock()
+
+    def add(self, entry: str, ttl: float, now: float | None = None) -> None:
+        expires = (now if now is not None else time.time()) + ttl
+        bucket = -int(-expires // BUCKET_SECONDS)  # first bucket boundary at or after expiry
+        line = f"{entry}\t{ttl:g}\n".encode()
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            # One short O_APPEND write per entry, so concurrent writers never interleave lines
+            fd = os.open(os.path.join(self.dir, f"{bucket}.idx"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def _expired_buckets(self, now: float) -> Iterator[str]:
+        try:
+            names = os.listdir(self.dir)
+        except FileNotFoundError:
+            return
+        for name in sorted(names):
+            stem, ext = os.path.splitext(name)
+            if ext == ".idx" and stem.isdigit() and int(stem) * BUCKET_SECONDS <= now:
+                yield os.path.join(self.dir, name)
+
+    def _files(self, entry: str) -> List[os.DirEntry]:
+        """The entry's file and its "<entry>.*" siblings; nothing for paths outside the root"""
+        path = os.path.normpath(os.path.join(self.root, entry))
+        folder, stem = os.path.split(path)
+        if os.path.commonpath([self.root, folder]) != self.root:
+            return []
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            return []
+        return [e for e in entries if e.name == stem or e.name.startswith(f"{stem}.")]
+
+    def _modified_since(self, entry: str, since: float) -> bool:
+        for e in self._files(entry):
+            try:
+                if e.stat().st_mtime > since:
+                    return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    def remove(self, entry: str) -> Tuple[int, int]:
+        """Delete an entry's files now; returns (files removed, bytes reclaimed)"""
+        files = reclaimed = 0
+        for e in self._files(entry):
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+            except FileNotFoundError:
+                continue
+            files += 1
+            reclaimed += size
+        return files, reclaimed
+
+    def sweep(
+        self,
+        now: float | None = None,
+        on_remove: Callable[[str], None] | None = None,
+    ) -> Tuple[int, int]:
+        """
+        Delete the entries of expired buckets that have not been written since;
+        returns (files removed, bytes reclaimed)
+        """
+        now = now if now is not None else time.time()
+        files = reclaimed = 0
+        for bucket in self._expired_buckets(now):
+            entries: Dict[str, float] = {}
+            with open(bucket) as fh:
+                for line in filter(None, fh.read().splitlines()):
+                    entry, _, ttl = line.partition("\t")
+                    # Lines written before TTLs were recorded have none and expire unconditionally
+                    entries[entry] = max(entries.get(entry, 0.0), float(ttl or 0))
+            for entry, ttl in entries.items():
+                if ttl and self._modified_since(entry, now - ttl):
+                    continue
+                f, b = self.remove(entry)
+                if on_remove:
+                    on_remove(entry)
+                files += f
+                reclaimed += b
+            os.remove(bucket)
+        return files, reclaimed
+
+def scan_expired(root: str, max_age: float, now: float | None = None) -> Tuple[int, int]:
+    """Fallback walk + stat of every file under `root`, for files written before the index existed"""
+    now = now if now is not None else time.time()
+    files = reclaimed = 0
+    for folder, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d != INDEX_DIR]
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                st = os.stat(path)
+                if now - st.st_mtime <= max_age:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            files += 1
+            reclaimed += st.st_size
+    return files, reclaimed
+
+@lru_cache(maxsize=None)
+def expiry_index(root: str) -> ExpiryIndex:
+    """One shared index (and append lock) per tmp root"""
+    return ExpiryIndex(os.path.abspath(root))
@@ -1,9 +1,109 @@
-from PIL import Image, ImageEnhance, ImageFilter
-from typing import Literal
+import os, re
+from functools import lru_cache
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ImageOps
+from typing import List, Literal, Tuple, get_args
 
-FilterType = Literal["grayscale", "sepia", "brightness", "contrast", "blur", "sharpen"]
+FilterType = Literal["grayscale", "sepia", "brightness", "contrast", "blur", "sharpen", "chromakey"]
+FILTER_TYPES = get_args(FilterType)
 
-def apply_filter(image: Image.Image, filter_type: FilterType, intensity: float = 1.0) -> Image.Image:
+BACKDROP_DIR = os.path.abspath(os.environ.get("BACKDROP_DIR", os.path.join(os.path.dirname(__file__), "..", "backdrops")))
+BACKDROP_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+SOLID_BACKDROPS = {
+    "white": (255, 255, 255, 255),
+    "black": (0, 0, 0, 255),
+    "pink": (255, 192, 203, 255),
+    "sky": (135, 206, 235, 255),
+}
+# Pillow HSV hue runs 0-255 over the colour wheel; green is 120 degrees
+HUE_SCALE = 256 / 360
+GREEN_HUE = round(120 * HUE_SCALE)
+# Border hues this close to green are taken as the screen; anything else falls back to GREEN_HUE
+KEY_SEARCH = round(45 * HUE_SCALE)
+# Share of the frame's width/height sampled as border on each side
+BORDER = 0.05
+
+def list_backdrops() -> List[str]:
+    """Built-in solid backdrops plus any images found in BACKDROP_DIR"""
+    names = list(SOLID_BACKDROPS)
+    if os.path.isdir(BACKDROP_DIR):
+        for fn in sorted(os.listdir(BACKDROP_DIR)):
+            name, ext = os.path.splitext(fn)
+            if ext.lower() in BACKDROP_EXTS and name not in names:
+                names.append(name)
+    return names
+
+@lru_cache(maxsize=16)
+def _backdrop_source(name: str) -> Image.Image:
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        raise ValueError(f"Unknown backdrop: {name}")
+    for ext in BACKDROP_EXTS:
+        fn = os.path.join(BACKDROP_DIR, name + ext)
+        if os.path.isfile(fn):
+            with Image.open(fn) as src:
+                return src.convert("RGBA")
+    raise ValueError(f"Unknown backdrop: {name}")
+
+@lru_cache(maxsize=32)
+def _backdrop(name: str, size: Tuple[int, int]) -> Image.Image:
+    """Backdrop pre-fitted (cover + center crop) to a frame size. Callers must not mutate it."""
+    if name in SOLID_BACKDROPS:
+        return Image.new("RGBA", size, SOLID_BACKDROPS[name])
+    return ImageOps.fit(_backdrop_source(name), size, Image.Resampling.BICUBIC)
+
+def _ramp(lo: float, hi: float) -> list:
+    """LUT rising from 0 at `lo` to 255 at `hi`"""
+    return [0 if v <= lo else 255 if v >= hi else int(255 * (v - lo) / (hi - lo)) for v in range(256)]
+
+@lru_cache(maxsize=32)
+def _chroma_luts(key_hue: int, intensity: float) -> Tuple[list, list, list]:
+    """
+    LUTs over the H, S and V planes that are 255 where a pixel belongs to the screen:
+    hue near the key hue (chroma direction, so shade and lighting do not matter),
+    saturated enough for that hue to mean something, and not too dark
+    """
+    intensity = max(intensity, 0.1)
+    # Hues within `inner` of the key are fully keyed out, beyond `outer` fully kept
+    inner = 25 * HUE_SCALE * intensity
+    outer = inner + 15 * HUE_SCALE
+    hue_lut = []
+    for h in range(256):
+        d = abs(h - key_hue)
+        d = min(d, 256 - d)
+        hue_lut.append(255 if d <= inner else 0 if d >= outer else int(255 * (outer - d) / (outer - inner)))
+    sat_lut = _ramp(48 / intensity, 80 / intensity)
+    val_lut = _ramp(24, 48)
+    return hue_lut, sat_lut, val_lut
+
+def _key_hue(h: Image.Image, s: Image.Image, v: Image.Image) -> int:
+    """
+    Hue of the screen, sampled from the frame border where the screen shows around
+    the subject: the median border hue near green, or GREEN_HUE without enough of it
+    """
+    w, h_px = h.size
+    bx, by = max(1, int(w * BORDER)), max(1, int(h_px * BORDER))
+    ring = Image.new("L", h.size, 255)
+    ring.paste(0, (bx, by, max(bx, w - bx), max(by, h_px - by)))
+    mask = ImageChops.multiply(ring, ImageChops.multiply(s.point(_ramp(63, 64)), v.point(_ramp(47, 48))))
+    hist = h.histogram(mask)
+    lo, hi = GREEN_HUE - KEY_SEARCH, GREEN_HUE + KEY_SEARCH
+    counts = hist[lo:hi + 1]
+    total = sum(counts)
+    # A screen fills a good part of the border; a few green pixels are not one
+    if total < (w * h_px - (w - 2 * bx) * (h_px - 2 * by)) * 0.2:
+        return GREEN_HUE
+    seen = 0
+    for hue, n in enumerate(counts, lo):
+        seen += n
+        if seen * 2 >= total:
+            return hue
+    return GREEN_HUE
+
+def apply_filter(
+    image: Image.Image,
+    filter_type: FilterType,
+    intensity: float = 1.0,
+    backdrop: str = "white",
+) -> Image.Image:
     """
     Apply a filter to an image.
     
@@ -11,6 +111,7 @@ def apply_filter(image: Image.Image, filter_type: FilterType, intensity: float =
         image: PIL Image to filter
         filter_type: Type of filter to apply
         intensity: Filter intensity (0.0 to 2.0, default 1.0)
+        backdrop: Backdrop name for the chromakey filter (see list_backdrops)
     
     Returns:
         Filtered PIL Image
@@ -72,4 +173,13 @@ def apply_filter(image: Image.Image, filter_type: FilterType, intensity: float =
         # Apply intensity
         return Image.blend(img, result, min(max(intensity, 0.0), 1.0))
     
+    elif filter_type == "chromakey":
+        # Key out the green screen by hue (sampled from the frame border, soft edges)
+        # and composite over the backdrop
+        h, s, v = img.convert("RGB").convert("HSV").split()
+        hue_lut, sat_lut, val_lut = _chroma_luts(_key_hue(h, s, v), intensity)
+        screen = ImageChops.darker(ImageChops.darker(h.point(hue_lut), s.point(sat_lut)), v.point(val_lut))
+        img.putalpha(ImageChops.multiply(ImageChops.invert(screen), img.getchannel("A")))
+        return Image.alpha_composite(_backdrop(backdrop, img.size), img)
+    
     return img
@@ -0,0 +1,142 @@
+import os, time, logging, threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from services import metrics
+from services.expiry import INDEX_DIR, expiry_index
+
+# Seconds between janitor cycles; 0 leaves cleanup to `flask cleanup`
+JANITOR_INTERVAL = float(os.environ.get("JANITOR_INTERVAL", 0))
+# Total bytes the tmp roots may hold before least-recently-served entries are evicted; 0 = no budget
+TMP_MAX_BYTES = int(os.environ.get("TMP_MAX_BYTES", 0))
+
+log = logging.getLogger(__name__)
+
+class Janitor:
+    """
+    Background thread that keeps the tmp roots within their age and byte limits.
+
+    Every cycle it sweeps the expired expiry-index buckets (max age), then evicts
+    whole entries - a strip with all its renditions, or one filter result - least
+    recently served first until usage is back under `max_bytes`. Usage is tallied
+    in memory from one scan at start-up plus the record()/touch() calls made as
+    files are written and served, so a cycle never walks the directories.
+    """
+
+    def __init__(self, roots: List[str], interval: float, max_bytes: int = 0):
+        self.roots = sorted({os.path.abspath(r) for r in roots})
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._usage = 0
+        # Files written from here on reach the tally through record(), not the start-up scan
+        self._since = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tmp-janitor", daemon=True)
+
+    def _scan(self) -> None:
+        """
+        Seed the LRU from disk, oldest files first, ahead of whatever record() has
+        tallied while the walk ran. Files modified since the janitor was created
+        are skipped, since record() already counted them.
+        """
+        found: Dict[Tuple[str, str], List[float]] = {}
+        for root in self.roots:
+            for folder, dirs, names in os.walk(root):
+                dirs[:] = [d for d in dirs if d != INDEX_DIR]
+                rel = os.path.relpath(folder, root)
+                for name in names:
+                    try:
+                        st = os.stat(os.path.join(folder, name))
+                    except FileNotFoundError:
+                        continue
+                    if st.st_mtime >= self._since:
+                        continue
+                    # Strips live in shards and group as <id>.*; top-level results stand alone
+                    stem = name if rel == "." else os.path.join(rel, name.split(".", 1)[0])
+                    info = found.setdefault((root, stem), [0, 0.0])
+                    info[0] += st.st_size
+                    info[1] = max(info[1], st.st_mtime)
+        entries: "OrderedDict[Tuple[str, str], int]" = OrderedDict(
+            (key, size) for key, (size, _) in sorted(found.items(), key=lambda kv: kv[1][1])
+        )
+        with self._lock:
+            for key, size in self._entries.items():
+                entries[key] = entries.pop(key, 0) + size
+            self._entries = entries
+            self._usage = sum(entries.values())
+
+    def record(self, root: str, entry: str, size: int) -> None:
+        """`size` bytes were written (or, negative, freed) for an entry; counts as a use"""
+        key = (os.path.abspath(root), entry)
+        with self._lock:
+            self._entries[key] = self._entries.get(key, 0) + size
+            self._entries.move_to_end(key)
+            self._usage += size
+
+    def touch(self, root: str, entry: str) -> None:
+        key = (os.path.abspath(root), entry)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def _forget(self, root: str, entry: str) -> None:
+        with self._lock:
+            self._usage -= self._entries.pop((root, entry), 0)
+
+    def run_once(self) -> None:
+        start = time.perf_counter()
+        expired = evicted = 0
+        for root in self.roots:
+            files, _ = expiry_index(root).sweep(on_remove=lambda entry, root=root: self._forget(root, entry))
+            expired += files
+        while self.max_bytes:
+            with self._lock:
+                if self._usage <= self.max_bytes or not self._entries:
+                    break
+                (root, entry), size = self._entries.popitem(last=False)
+                self._usage -= size
+            expiry_index(root).remove(entry)
+            evicted += 1
+        metrics.inc("janitor.expired_files", expired)
+        metrics.inc("janitor.evictions", evicted)
+        metrics.set_gauge("janitor.disk_bytes", self._usage)
+        metrics.set_gauge("janitor.cycle_seconds", time.perf_counter() - start)
+
+    def _run(self) -> None:
+        self._scan()
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("Janitor cycle failed")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> "Janitor":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+_janitor: Janitor | None = None
+_start_lock = threading.Lock()
+
+def start_janitor(roots: List[str], interval: float = JANITOR_INTERVAL, max_bytes: int = TMP_MAX_BYTES) -> Janitor | None:
+    """Start the process-wide janitor once; a no-op when `interval` is 0"""
+    global _janitor
+    if _janitor is not None or interval <= 0:
+        return _janitor
+    with _start_lock:
+        if _janitor is None:
+            _janitor = Janitor(roots, interval, max_bytes).start()
+    return _janitor
+
+def record(root: str, entry: str, size: int) -> None:
+    if _janitor is not None:
+        _janitor.record(root, entry, size)
+
+def touch(root: str, entry: str) -> None:
+    if _janitor is not None:
+        _janitor.touch(root, entry)
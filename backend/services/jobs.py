@@ -0,0 +1,141 @@
+import os, time, uuid, logging, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from services import metrics
+from services.codec import InvalidImage
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Jobs accepted but not finished (queued + running) before POST /jobs answers 503
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 32))
+JOB_TTL = int(os.environ.get("JOB_TTL", 3600))
+
+log = logging.getLogger(__name__)
+_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="render-job")
+_slots = threading.BoundedSemaphore(JOB_QUEUE_SIZE)
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+class QueueFull(Exception):
+    """Every job slot is taken"""
+
+class Job:
+    """
+    State of one background render plus its event log. Events are appended under
+    a condition variable so any number of SSE streams can replay and follow them.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.stage: str | None = None
+        self.totals: Dict[str, int] = {}
+        self.done: Dict[str, int] = {}
+        self.result: Dict[str, Any] | None = None
+        self.error: Dict[str, str] | None = None
+        self.created = time.time()
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self._cond = threading.Condition()
+
+    def _emit(self, event: str, data: Dict[str, Any], status: str | None = None) -> None:
+        with self._cond:
+            if status:
+                self.status = status
+            self.events.append((event, data))
+            self._cond.notify_all()
+
+    def progress(self, stage: str, total: int) -> None:
+        """One more of `total` units of `stage` finished (a frame decoded/filtered, a band composed, ...)"""
+        with self._cond:
+            # Under the lock: to_dict() reads these from request threads
+            self.stage = stage
+            self.totals[stage] = total
+            self.done[stage] = self.done.get(stage, 0) + 1
+            self._emit("progress", {"stage": stage, "done": self.done[stage], "total": total})
+
+    def start(self) -> None:
+        self._emit("status", {"status": "running"}, status="running")
+
+    def finish(self, **result) -> None:
+        self.result = result
+        self._emit("done", result, status="done")
+
+    def fail(self, code: str, message: str) -> None:
+        self.error = {"code": code, "message": message}
+        self._emit("failed", self.error, status="failed")
+
+    def follow(self, start: int = 0, timeout: float = 15.0) -> Iterator[Tuple[int, str, Dict[str, Any]] | None]:
+        """
+        Yield (index, event, data) from index `start` until the job ends;
+        None marks `timeout` seconds without an event
+        """
+        i = start
+        while True:
+            with self._cond:
+                if i >= len(self.events) and self.status not in ("done", "failed"):
+                    self._cond.wait(timeout)
+                pending = self.events[i:]
+                finished = self.status in ("done", "failed")
+            if not pending:
+                if finished:
+                    return
+                yield None
+                continue
+            for event, data in pending:
+                yield i, event, data
+                i += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._cond:
+            out: Dict[str, Any] = {
+                "jobId": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": {stage: {"done": self.done[stage], "total": total}
+                             for stage, total in self.totals.items()},
+            }
+        if self.result:
+            out.update(self.result)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+def _expire(now: float) -> None:
+    while _jobs:
+        job = next(iter(_jobs.values()))
+        if now - job.created <= JOB_TTL or job.status not in ("done", "failed"):
+            return
+        del _jobs[job.id]
+
+def _run(job: Job, work: Callable[[Job], None]) -> None:
+    start = time.perf_counter()
+    try:
+        job.start()
+        work(job)
+        if job.status == "running":
+            job.finish()
+        metrics.inc("jobs.done")
+    except Exception as e:
+        log.exception("Render job %s failed", job.id)
+        job.fail("invalid_image" if isinstance(e, InvalidImage) else "processing_error", str(e))
+        metrics.inc("jobs.failed")
+    finally:
+        _slots.release()
+        metrics.inc("jobs.seconds", time.perf_counter() - start)
+
+def submit(work: Callable[[Job], None]) -> Job:
+    """Queue `work(job)` on the worker pool; raises QueueFull when JOB_QUEUE_SIZE jobs are pending"""
+    if not _slots.acquire(blocking=False):
+        metrics.inc("jobs.rejected")
+        raise QueueFull("Render queue is full, try again shortly")
+    job = Job()
+    with _jobs_lock:
+        _expire(time.time())
+        _jobs[job.id] = job
+    metrics.inc("jobs.queued")
+    _pool.submit(_run, job, work)
+    return job
+
+def get_job(job_id: str) -> Job | None:
+    with _jobs_lock:
+        return _jobs.get(job_id)
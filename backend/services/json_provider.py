@@ -0,0 +1,62 @@
+import logging
+from typing import Any
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when it is installed. Output matches the
+    default provider (sorted keys, HTTP dates, Decimal as str, indented in debug
+    mode) except that non-ASCII text is emitted as UTF-8 rather than \\u escapes.
+    Anything orjson cannot encode (e.g. ints beyond 64 bits) falls back to the stdlib.
+    """
+
+    def _options(self, kwargs: dict) -> int:
+        opts = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            opts |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            opts |= orjson.OPT_INDENT_2
+        return opts
+
+    def _dumpb(self, obj: Any, kwargs: dict) -> bytes | None:
+        if set(kwargs) - {"sort_keys", "indent", "separators"}:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(kwargs))
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        data = self._dumpb(obj, kwargs)
+        return super().dumps(obj, **kwargs) if data is None else data.decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Like the default, but orjson's bytes go into the response without a str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {"indent": 2} if (self.compact is None and self._app.debug) or self.compact is False else {}
+        data = self._dumpb(obj, dump_args)
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data + b"\n", mimetype=self.mimetype)
+
+def install_json_provider(app: Flask) -> None:
+    """Use FastJSONProvider for jsonify / request.get_json when orjson is importable"""
+    if orjson is None:
+        log.warning("orjson is not installed; serving JSON with the stdlib encoder")
+        return
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    log.info("Serving JSON with orjson %s", orjson.__version__)
@@ -0,0 +1,147 @@
+import json
+from typing import Any, BinaryIO, Collection, Iterator, Tuple
+
+CHUNK_SIZE = 64 * 1024
+_WS = b" \t\r\n"
+_SCALAR_END = b",}] \t\r\n"
+
+class _Reader:
+    """Byte buffer over a stream, refilled on demand and trimmed between values"""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self) -> int:
+        """Next non-whitespace byte, without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON body")
+
+    def expect(self, chars: bytes) -> int:
+        c = self.peek()
+        if c not in chars:
+            raise ValueError(f"Invalid JSON body: expected one of {chars.decode()!r}")
+        self.pos += 1
+        return c
+
+    def _string_end(self, start: int) -> int:
+        """Index of the closing quote of the string whose opening quote is at `start`"""
+        i = start + 1
+        while True:
+            end = self.buf.find(b'"', i)
+            if end < 0:
+                i = len(self.buf)
+                if not self.fill():
+                    raise ValueError("Unterminated string in JSON body")
+                continue
+            backslashes = 0
+            while self.buf[end - 1 - backslashes] == 0x5C:
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return end
+            i = end + 1
+
+    def raw_value(self) -> Tuple[bytes, str]:
+        """
+        Raw bytes of the next value and its kind: "str" (string contents without
+        quotes, no escapes), "escaped" (string contents needing unescaping) or "json".
+        """
+        c = self.peek()
+        # Everything before the value has been consumed; drop it so the buffer holds one value at most
+        del self.buf[:self.pos]
+        self.pos = 0
+        if c == 0x22:  # "
+            end = self._string_end(0)
+            self.pos = end + 1
+            raw = bytes(self.buf[1:end])
+            return raw, "escaped" if b"\\" in raw else "str"
+        if c in b"[{":
+            depth, i = 0, 0
+            while True:
+                if i >= len(self.buf):
+                    if not self.fill():
+                        raise ValueError("Unexpected end of JSON body")
+                    continue
+                b = self.buf[i]
+                if b == 0x22:
+                    i = self._string_end(i)
+                elif b in b"[{":
+                    depth += 1
+                elif b in b"]}":
+                    depth -= 1
+                    if depth == 0:
+                        self.pos = i + 1
+                        return bytes(self.buf[:self.pos]), "json"
+                i += 1
+        i = 0
+        while True:
+            while i < len(self.buf) and self.buf[i] not in _SCALAR_END:
+                i += 1
+            if i < len(self.buf) or not self.fill():
+                self.pos = i
+                return bytes(self.buf[:i]), "json"
+
+def _load(raw: bytes, kind: str) -> Any:
+    if kind == "escaped":
+        return json.loads(b'"' + raw + b'"')
+    return json.loads(raw)
+
+def iter_object(
+    stream: BinaryIO,
+    stream_keys: Collection[str] = (),
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Incrementally parse a top-level JSON object from `stream`.
+
+    Yields ("value", key, value) for each member. Arrays under `stream_keys` are
+    announced as ("value", key, []) and then yielded element by element as
+    ("item", key, element) as soon as each element has arrived; escape-free string
+    elements come through as raw bytes, so base64 payloads reach the decoder without
+    an intermediate str. The caller can stop iterating at any point and the rest of
+    the body is never read.
+    """
+    r = _Reader(stream, chunk_size)
+    r.expect(b"{")
+    if r.peek() == 0x7D:  # }
+        return
+    while True:
+        if r.peek() != 0x22:
+            raise ValueError("Invalid JSON body: expected a key")
+        raw, kind = r.raw_value()
+        key = raw.decode() if kind == "str" else _load(raw, kind)
+        r.expect(b":")
+        if key in stream_keys and r.peek() == 0x5B:  # [
+            r.pos += 1
+            yield "value", key, []
+            if r.peek() == 0x5D:  # ]
+                r.pos += 1
+            else:
+                while True:
+                    raw, kind = r.raw_value()
+                    yield "item", key, raw if kind == "str" else _load(raw, kind)
+                    if r.expect(b",]") == 0x5D:
+                        break
+        else:
+            raw, kind = r.raw_value()
+            yield "value", key, raw.decode() if kind == "str" else _load(raw, kind)
+        if r.expect(b",}") == 0x7D:
+            return
@@ -0,0 +1,18 @@
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+_gauges: dict = {}
+
+def inc(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
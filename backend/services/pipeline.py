@@ -0,0 +1,60 @@
+from typing import Callable, Iterator, List, Tuple
+from PIL import Image
+from services.compose import BAND_ROWS, DEFAULT_RESAMPLE, stream_layout
+from services.filters import apply_filter
+
+def _filter_chain(filters: List[dict]):
+    def run(frame: Image.Image) -> Image.Image:
+        for f in filters:
+            frame = apply_filter(frame, f["type"], f.get("intensity", 1.0), backdrop=f.get("backdrop", "white"))
+        return frame
+    return run
+
+Progress = Callable[[str, int], None]
+
+def _tracked(chain, count: int, progress: Progress):
+    """Transform that reports each decoded (and filtered) frame"""
+    def run(frame: Image.Image) -> Image.Image:
+        progress("decode", count)
+        if chain:
+            frame = chain(frame)
+            progress("filter", count)
+        return frame
+    return run
+
+def _tracked_bands(bands: Iterator[Image.Image], count: int, progress: Progress) -> Iterator[Image.Image]:
+    """Reports each band composed, then encoded once the encoder comes back for the next one"""
+    for band in bands:
+        progress("compose", count)
+        yield band
+        progress("encode", count)
+
+def render_strip(
+    frame_urls: List[str],
+    filters: List[dict] | None = None,
+    layout: str = "vertical",
+    rows: int | None = None,
+    cols: int | None = None,
+    frame_width: int | None = None,
+    padding: int = 16,
+    resample: str = DEFAULT_RESAMPLE,
+    progress: Progress | None = None,
+) -> Tuple[Tuple[int, int], Iterator[Image.Image]]:
+    """
+    Decode -> filter -> compose entirely in memory, returning the strip size and its bands.
+
+    Frames are decoded at their final size, so the filter chain runs on the
+    pixels that actually end up in the strip. `progress(stage, total)` is called
+    once per frame decoded / filtered and per band composed / encoded; frames are
+    decoded lazily as the bands reach them, so the stages interleave.
+    """
+    chain = _filter_chain(filters) if filters else None
+    if progress:
+        chain = _tracked(chain, len(frame_urls), progress)
+    size, bands = stream_layout(
+        frame_urls, layout, rows, cols, frame_width=frame_width, padding=padding,
+        resample=resample, transform=chain,
+    )
+    if progress:
+        bands = _tracked_bands(bands, -(-size[1] // BAND_ROWS), progress)
+    return size, bands
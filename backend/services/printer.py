@@ -0,0 +1,103 @@
+from functools import lru_cache
+from typing import BinaryIO, Iterable, Iterator
+from PIL import Image, ImageChops, ImageOps
+
+# Printable dots per line at 203 dpi for common thermal paper widths (mm)
+PAPER_DOTS = {58: 384, 80: 576}
+DITHER_MODES = ("floyd-steinberg", "ordered")
+BAND_ROWS = 64
+
+ESC_INIT = b"\x1b\x40"
+FEED_AND_CUT = b"\x1b\x64\x04" + b"\x1d\x56\x42\x00"
+
+_BAYER_4X4 = (0, 8, 2, 10, 12, 4, 14, 6, 3, 11, 1, 9, 15, 7, 13, 5)
+_INK_LUT = [0] + [255] * 255
+
+class FileSink:
+    """Printer sink that appends raw ESC/POS bytes to a file or device node (e.g. /dev/usb/lp0)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, chunks: Iterable[bytes]) -> int:
+        written = 0
+        with open(self.path, "ab") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                written += len(chunk)
+        return written
+
+@lru_cache(maxsize=8)
+def _bayer_tile(width: int, height: int) -> Image.Image:
+    """Ordered-dither threshold map tiled to one band"""
+    cell = Image.new("L", (4, 4))
+    cell.putdata([v * 16 + 8 for v in _BAYER_4X4])
+    row = Image.new("L", (width, 4))
+    for x in range(0, width, 4):
+        row.paste(cell, (x, 0))
+    tile = Image.new("L", (width, height))
+    for y in range(0, height, 4):
+        tile.paste(row, (0, y))
+    return tile
+
+def _ink_plane(strip: Image.Image, dots: int) -> Image.Image:
+    """Flatten onto white paper, scale to the printer's dot width and invert so 255 = full ink"""
+    if strip.mode in ("RGBA", "LA", "P"):
+        strip = strip.convert("RGBA")
+        paper = Image.new("RGBA", strip.size, (255, 255, 255, 255))
+        strip = Image.alpha_composite(paper, strip)
+    gray = strip.convert("L")
+    height = max(1, round(gray.height * dots / gray.width))
+    gray = gray.resize((dots, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return ImageOps.invert(gray)
+
+def _raster_command(band: Image.Image) -> bytes:
+    """GS v 0 raster bit image for a mode "1" band (bit set = dot printed)"""
+    width_bytes = (band.width + 7) // 8
+    header = b"\x1d\x76\x30\x00" + width_bytes.to_bytes(2, "little") + band.height.to_bytes(2, "little")
+    return header + band.tobytes()
+
+def check_print_options(paper_mm: int, dither: str) -> None:
+    if paper_mm not in PAPER_DOTS:
+        raise ValueError(f"Unsupported paper width: {paper_mm}")
+    if dither not in DITHER_MODES:
+        raise ValueError(f"Unsupported dither mode: {dither}")
+
+def iter_escpos(
+    strip: Image.Image | BinaryIO,
+    paper_mm: int = 58,
+    dither: str = "floyd-steinberg",
+    band_rows: int = BAND_ROWS,
+) -> Iterator[bytes]:
+    """
+    Return ESC/POS commands that print `strip` on a thermal printer, one raster band at a time.
+
+    `strip` is an image or a binary file holding an encoded one; a file is closed
+    as soon as the ink plane has been built from it. Only the 8-bit ink plane, the
+    1-bit bitmap and a single band command are ever held in memory; the full
+    command stream is never buffered.
+    """
+    check_print_options(paper_mm, dither)
+    return _iter_bands(strip, PAPER_DOTS[paper_mm], dither, band_rows)
+
+def _iter_bands(strip: Image.Image | BinaryIO, dots: int, dither: str, band_rows: int) -> Iterator[bytes]:
+    if isinstance(strip, Image.Image):
+        ink = _ink_plane(strip, dots)
+    else:
+        with strip, Image.open(strip) as img:
+            ink = _ink_plane(img, dots)
+    # Floyd-Steinberg has to see the whole plane to diffuse error across band edges
+    bitmap = ink.convert("1") if dither == "floyd-steinberg" else None
+
+    yield ESC_INIT
+    for y in range(0, ink.height, band_rows):
+        rows = min(band_rows, ink.height - y)
+        if bitmap is not None:
+            band = bitmap.crop((0, y, dots, y + rows))
+        else:
+            tile = _bayer_tile(dots, band_rows)
+            if rows < band_rows:
+                tile = tile.crop((0, 0, dots, rows))
+            band = ImageChops.subtract(ink.crop((0, y, dots, y + rows)), tile).point(_INK_LUT, "1")
+        yield _raster_command(band)
+    yield FEED_AND_CUT
@@ -0,0 +1,86 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Tuple
+from PIL import Image
+
+def _parse_renditions(spec: str) -> Dict[str, int]:
+    out = {}
+    for item in spec.split(","):
+        name, _, edge = item.strip().partition(":")
+        if name and edge:
+            out[name] = int(edge)
+    return out
+
+# name -> longest edge in px; the full-size strip is always available as "full"
+RENDITIONS = _parse_renditions(os.environ.get("STRIP_RENDITIONS", "social:1080,thumb:320,placeholder:32"))
+
+def rendition_sizes(size: Tuple[int, int]) -> List[Tuple[str, Tuple[int, int]]]:
+    """Renditions smaller than `size`, largest first"""
+    w, h = size
+    out = []
+    for name, edge in sorted(RENDITIONS.items(), key=lambda kv: -kv[1]):
+        scale = edge / max(w, h)
+        if scale < 1:
+            out.append((name, (max(1, round(w * scale)), max(1, round(h * scale)))))
+    return out
+
+class _BandScaler:
+    """
+    Area-downsample an image delivered as horizontal bands. Output rows are only
+    emitted once their whole source span has arrived, so band edges leave no seams.
+    """
+
+    def __init__(self, src_size: Tuple[int, int], dst_size: Tuple[int, int]):
+        self.src_w, self.src_h = src_size
+        self.dst_w, self.dst_h = dst_size
+        self.canvas = Image.new("RGBA", dst_size)
+        self.pending: Image.Image | None = None
+        self.pending_y = 0
+        self.out_y = 0
+
+    def _src_y(self, row: int) -> float:
+        return row * self.src_h / self.dst_h
+
+    def feed(self, band: Image.Image) -> None:
+        if self.pending is not None:
+            buf = Image.new("RGBA", (self.src_w, self.pending.height + band.height))
+            buf.paste(self.pending, (0, 0))
+            buf.paste(band, (0, self.pending.height))
+        else:
+            buf = band
+        end = self.pending_y + buf.height
+        ready = self.dst_h if end >= self.src_h else int(end * self.dst_h / self.src_h)
+        if ready > self.out_y:
+            box = (0, self._src_y(self.out_y) - self.pending_y, self.src_w, self._src_y(ready) - self.pending_y)
+            part = buf.resize((self.dst_w, ready - self.out_y), Image.Resampling.BOX, box=box)
+            self.canvas.paste(part, (0, self.out_y))
+            self.out_y = ready
+        keep = min(int(self._src_y(self.out_y)) - self.pending_y, buf.height)
+        self.pending = buf.crop((0, keep, self.src_w, buf.height)) if keep < buf.height else None
+        self.pending_y += keep
+
+class RenditionBuilder:
+    """
+    Builds every configured rendition in the same pass that streams the full strip:
+    the largest is area-sampled from the bands as they go by, each smaller one is
+    cascaded from the previous rendition.
+    """
+
+    def __init__(self, size: Tuple[int, int]):
+        self.sizes = rendition_sizes(size)
+        self.scaler = _BandScaler(size, self.sizes[0][1]) if self.sizes else None
+
+    def tap(self, bands: Iterable[Image.Image]) -> Iterator[Image.Image]:
+        for band in bands:
+            if self.scaler:
+                self.scaler.feed(band)
+            yield band
+
+    def finish(self) -> List[Tuple[str, Image.Image]]:
+        if not self.scaler:
+            return []
+        img = self.scaler.canvas
+        out = [(self.sizes[0][0], img)]
+        for name, size in self.sizes[1:]:
+            img = img.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+            out.append((name, img))
+        return out
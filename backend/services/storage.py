@@ -0,0 +1,343 @@
+import io, os, time, hashlib, tempfile, threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Tuple
+from services import metrics
+
+try:
+    import boto3
+except ImportError:  # optional; only needed for STRIP_STORAGE=s3
+    boto3 = None
+
+class ObjectStat(NamedTuple):
+    size: int
+    mtime: float
+    etag: str
+
+class Storage(ABC):
+    """
+    Byte store for strips, addressed by relative keys such as "ab/cd/<id>.png".
+    put() consumes an iterable of chunks and get() returns a readable binary
+    file object, so neither side needs a whole file in memory (except MemoryStorage).
+    """
+
+    #: Local directory holding the keys as files, for backends that have one
+    root: str | None = None
+
+    @abstractmethod
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Store `chunks` under `key`, replacing any previous object atomically; returns the size"""
+
+    @abstractmethod
+    def get(self, key: str) -> BinaryIO:
+        """Open an object for reading; raises FileNotFoundError when it does not exist"""
+
+    @abstractmethod
+    def stat(self, key: str) -> ObjectStat | None:
+        """Size, mtime and etag of an object, or None when it does not exist"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an object; missing keys are ignored"""
+
+    def path(self, key: str) -> str | None:
+        """Filesystem path of an object, if it lives on local disk (lets send_file use sendfile)"""
+        return None
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+class LocalStorage(Storage):
+    """Files under a local directory, each write going to its own .part file and os.replace()d into place"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        path = self.path(key)
+        folder, name = os.path.split(path)
+        os.makedirs(folder, exist_ok=True)
+        # A unique .part per writer, so concurrent first writes of one key never share a file
+        fd, part = tempfile.mkstemp(dir=folder, prefix=f"{name}.", suffix=".part")
+        os.fchmod(fd, 0o644)  # mkstemp creates 0600
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+                    size += len(chunk)
+            os.replace(part, path)
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+        return size
+
+    def get(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def stat(self, key: str) -> ObjectStat | None:
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectStat(st.st_size, st.st_mtime, f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+class MemoryStorage(Storage):
+    """In-process LRU of objects, capped at `max_bytes`; for single-node kiosks and tests"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._objects: "OrderedDict[str, Tuple[bytes, ObjectStat]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        data = b"".join(chunks)
+        st = ObjectStat(len(data), time.time(), hashlib.blake2b(data, digest_size=16).hexdigest())
+        with self._lock:
+            old = self._objects.pop(key, None)
+            if old:
+                self._size -= old[1].size
+            self._objects[key] = (data, st)
+            self._size += st.size
+            while self._size > self.max_bytes and len(self._objects) > 1:
+                _, (_, evicted) = self._objects.popitem(last=False)
+                self._size -= evicted.size
+        return st.size
+
+    def _entry(self, key: str) -> Tuple[bytes, ObjectStat] | None:
+        with self._lock:
+            entry = self._objects.get(key)
+            if entry:
+                self._objects.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> BinaryIO:
+        entry = self._entry(key)
+        if entry is None:
+            raise FileNotFoundError(key)
+        return io.BytesIO(entry[0])
+
+    def stat(self, key: str) -> ObjectStat | None:
+        entry = self._entry(key)
+        return entry[1] if entry else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._objects.pop(key, None)
+            if entry:
+                self._size -= entry[1].size
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view of a chunk iterator, so uploads stream without buffering the object"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buf = b""
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buf = bytes(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        self.size += n
+        return n
+
+class S3Storage(Storage):
+    """
+    Objects in an S3-compatible bucket (AWS, MinIO, ...). Uploads go through
+    upload_fileobj, which switches to a multipart upload for large strips.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("STRIP_STORAGE=s3 needs boto3 installed")
+            client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        reader = _ChunkReader(chunks)
+        self.client.upload_fileobj(io.BufferedReader(reader, 1024 * 1024), self.bucket, self._key(key))
+        return reader.size
+
+    def get(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(key)
+
+    def stat(self, key: str) -> ObjectStat | None:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectStat(head["ContentLength"], head["LastModified"].timestamp(), head["ETag"].strip('"'))
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+class CachedStorage(Storage):
+    """
+    Hot-object LRU in front of another backend, for previews fetched over and over
+    right after composing (download page, share links, slideshow).
+
+    Objects up to `max_object_bytes` are kept in memory when written and when first
+    read, for at most `ttl` seconds and `max_bytes` in total; get() on a hit is a
+    BytesIO over the cached bytes, so the object body is never read again. path()
+    is always None so callers stream from get() instead of going back to disk.
+
+    The backend stays authoritative for what exists: stat() always asks it, and a
+    hit is only served while the backend's etag still matches. Files the expiry
+    sweep, the janitor, `flask cleanup` or another worker deleted or replaced behind
+    the cache's back are never served from memory.
+    """
+
+    def __init__(self, backend: Storage, max_bytes: int, ttl: float, max_object_bytes: int):
+        self.backend = backend
+        self.root = backend.root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_object_bytes = max_object_bytes
+        self._objects: "OrderedDict[str, Tuple[bytes, ObjectStat, float]]" = OrderedDict()
+        self._size = 0
+        self._hits = self._misses = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str, st: ObjectStat | None) -> Tuple[bytes, ObjectStat, float] | None:
+        """The cached copy of `key`, if it is fresh and still what the backend reports as `st`"""
+        with self._lock:
+            entry = self._objects.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic() or st is None or entry[1].etag != st.etag:
+                self._drop(key)
+                return None
+            self._objects.move_to_end(key)
+            return entry
+
+    def _drop(self, key: str) -> None:
+        entry = self._objects.pop(key, None)
+        if entry:
+            self._size -= len(entry[0])
+
+    def _remember(self, key: str, data: bytes, st: ObjectStat | None) -> None:
+        if st is None or len(data) > self.max_object_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._objects[key] = (data, st, time.monotonic() + self.ttl)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._objects)))
+            metrics.set_gauge("hot_cache.bytes", self._size)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            ratio = self._hits / (self._hits + self._misses)
+        metrics.inc("hot_cache.hits" if hit else "hot_cache.misses")
+        metrics.set_gauge("hot_cache.hit_ratio", ratio)
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        kept: list = []
+
+        def tee() -> Iterator[bytes]:
+            total = 0
+            for chunk in chunks:
+                total += len(chunk)
+                if total <= self.max_object_bytes:
+                    kept.append(bytes(chunk))
+                elif kept:
+                    kept.clear()
+                yield chunk
+
+        with self._lock:
+            self._drop(key)
+        size = self.backend.put(key, tee())
+        if kept and sum(map(len, kept)) == size:
+            self._remember(key, b"".join(kept), self.backend.stat(key))
+        return size
+
+    def get(self, key: str) -> BinaryIO:
+        st = self.backend.stat(key)
+        entry = self._lookup(key, st)
+        if st is None:
+            raise FileNotFoundError(key)
+        self._count(entry is not None)
+        if entry is not None:
+            return io.BytesIO(entry[0])
+        if st.size > self.max_object_bytes:
+            return self.backend.get(key)
+        with self.backend.get(key) as fh:
+            data = fh.read()
+        self._remember(key, data, st)
+        return io.BytesIO(data)
+
+    def stat(self, key: str) -> ObjectStat | None:
+        st = self.backend.stat(key)
+        if st is None:
+            with self._lock:
+                self._drop(key)
+        return st
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._drop(key)
+        self.backend.delete(key)
+
+def storage_from_env(default_root: str) -> Storage:
+    """
+    Backend named by STRIP_STORAGE: local (default), memory or s3, behind the
+    hot-object cache unless HOT_CACHE_BYTES is 0
+    """
+    kind = os.environ.get("STRIP_STORAGE", "local")
+    if kind == "local":
+        backend = LocalStorage(default_root)
+    elif kind == "memory":
+        return MemoryStorage(int(os.environ.get("MEMORY_STORAGE_BYTES", 512 * 1024 * 1024)))
+    elif kind == "s3":
+        backend = S3Storage(
+            os.environ["S3_BUCKET"],
+            prefix=os.environ.get("S3_PREFIX", "strips/"),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL"),
+        )
+    else:
+        raise ValueError(f"Unknown STRIP_STORAGE: {kind}")
+    max_bytes = int(os.environ.get("HOT_CACHE_BYTES", 64 * 1024 * 1024))
+    if not max_bytes:
+        return backend
+    return CachedStorage(
+        backend,
+        max_bytes,
+        ttl=float(os.environ.get("HOT_CACHE_TTL", 300)),
+        max_object_bytes=int(os.environ.get("HOT_CACHE_MAX_OBJECT", 8 * 1024 * 1024)),
+    )
@@ -0,0 +1,216 @@
+import io, os, re, json, uuid, time, hashlib, logging, threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Tuple
+from PIL import Image
+from services import janitor, metrics
+from services.codec import FrameHandle
+from services.encode import EXTENSIONS, encode_image, iter_png
+from services.expiry import expiry_index
+from services.renditions import RENDITIONS, RenditionBuilder
+from services.storage import storage_from_env
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TMP_DIR = os.path.abspath(os.environ.get("TMP_DIR", os.path.join(BASE_DIR, "backend", "tmp")))
+os.makedirs(TMP_DIR, exist_ok=True)
+
+# Strips are written with a cheap zlib level on the request path, then recompressed in the background
+FAST_LEVEL = int(os.environ.get("STRIP_FAST_LEVEL", 1))
+STRIP_TTL = int(os.environ.get("STRIP_TTL", 24 * 3600))
+MAX_TRACKED_TIERS = 10000
+STRIP_ID = re.compile(r"[0-9a-f]{4}[0-9a-f-]{0,60}")
+# Files of the old flat layout: <uuid>.png, <uuid>.<rendition>.png, <uuid>[.<rendition>].q<n>.<ext>
+_FLAT_NAME = re.compile(r"([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.[\w.]+")
+
+log = logging.getLogger(__name__)
+# Where strips live (STRIP_STORAGE); expiry and the janitor only apply when it is local disk
+store = storage_from_env(TMP_DIR)
+_optimizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strip-optimize")
+_tiers: "OrderedDict[str, str]" = OrderedDict()
+_tiers_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+def strip_key(strip_id: str, size: str | None = None) -> str:
+    """Storage key of the full strip, or of one of its renditions, sharded as ab/cd/<id>"""
+    shard = f"{strip_id[:2]}/{strip_id[2:4]}/{strip_id}"
+    if size and size != "full":
+        return f"{shard}.{size}.png"
+    return f"{shard}.png"
+
+def strip_entry(strip_id: str) -> str:
+    """Expiry index / janitor entry covering a strip and every file written next to it"""
+    return strip_key(strip_id)[:-len(".png")]
+
+def _track(strip_id: str, size: int) -> None:
+    if store.root:
+        janitor.record(store.root, strip_entry(strip_id), size)
+
+def mark_served(strip_id: str) -> None:
+    if store.root:
+        janitor.touch(store.root, strip_entry(strip_id))
+
+def valid_strip_id(strip_id: str) -> bool:
+    return STRIP_ID.fullmatch(strip_id) is not None
+
+def migrate_flat_layout() -> int:
+    """Move strip files left in the top level of TMP_DIR into their shard directories"""
+    moved = 0
+    with os.scandir(TMP_DIR) as entries:
+        for entry in entries:
+            m = _FLAT_NAME.fullmatch(entry.name)
+            if not m or not entry.is_file() or entry.name.endswith(".part"):
+                continue
+            target = os.path.join(TMP_DIR, os.path.dirname(strip_key(m.group(1))))
+            os.makedirs(target, exist_ok=True)
+            os.replace(entry.path, os.path.join(target, entry.name))
+            moved += 1
+    return moved
+
+def transcoded_key(strip_id: str, size: str, fmt: str, quality: int | None) -> str:
+    base = strip_key(strip_id, size)[:-len(".png")]
+    return f"{base}.q{quality}.{EXTENSIONS[fmt]}"
+
+def ensure_transcoded(source: str, strip_id: str, size: str, fmt: str, quality: int | None) -> str:
+    """Encode a stored PNG into another format once, then reuse the object for every later request"""
+    key = transcoded_key(strip_id, size, fmt, quality)
+    if not store.exists(key):
+        with store.get(source) as fh, Image.open(fh) as img:
+            _track(strip_id, store.put(key, [encode_image(img, fmt, quality)]))
+        metrics.inc(f"transcode.{fmt}")
+    return key
+
+def _set_tier(strip_id: str, tier: str) -> None:
+    with _tiers_lock:
+        _tiers[strip_id] = tier
+        _tiers.move_to_end(strip_id)
+        while len(_tiers) > MAX_TRACKED_TIERS:
+            _tiers.popitem(last=False)
+
+def strip_tier(strip_id: str) -> str:
+    """Compression tier: fast until the background optimizer has swapped in the recompressed file"""
+    with _tiers_lock:
+        return _tiers.get(strip_id, "unknown")
+
+def _optimize_file(key: str) -> int:
+    """Recompress in place if that makes the file smaller; returns the bytes saved"""
+    st = store.stat(key)
+    if st is None:
+        return 0
+    buf = io.BytesIO()
+    with store.get(key) as fh, Image.open(fh) as img:
+        img.save(buf, format="PNG", optimize=True)
+    saved = st.size - buf.tell()
+    if saved <= 0:
+        return 0
+    store.put(key, [buf.getbuffer()])
+    metrics.inc("optimize.bytes_saved", saved)
+    return saved
+
+def _optimize(strip_id: str) -> None:
+    start = time.perf_counter()
+    try:
+        saved = _optimize_file(strip_key(strip_id))
+        for name in RENDITIONS:
+            saved += _optimize_file(strip_key(strip_id, name))
+        _track(strip_id, -saved)
+        _set_tier(strip_id, "optimized")
+        metrics.inc("optimize.done")
+    except Exception:
+        log.exception("Optimizing strip %s failed", strip_id)
+        metrics.inc("optimize.failed")
+    finally:
+        metrics.inc("optimize.seconds", time.perf_counter() - start)
+
+def content_id(frames: List[FrameHandle], **params) -> str:
+    """
+    Strip ID derived from the frames' content hashes plus every parameter that
+    affects the output, so identical compose requests map to the same strip.
+    Parameters left at None are dropped, so omitting one hashes like passing None.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for frame in frames:
+        h.update(bytes.fromhex(frame.digest))
+    params = {k: v for k, v in params.items() if v is not None}
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+def _refresh_expiry(strip_id: str) -> None:
+    """A dedup hit hands the strip out again, so it gets a full STRIP_TTL like a fresh write"""
+    if not store.root:
+        return
+    try:
+        # The sweep checks the file's age as well as the index, so both move forward
+        os.utime(os.path.join(store.root, strip_key(strip_id)))
+    except FileNotFoundError:
+        return
+    expiry_index(store.root).add(strip_entry(strip_id), STRIP_TTL)
+
+def store_once(strip_id: str, render: Callable[[], Tuple[Tuple[int, int], Iterator[Image.Image]]]) -> str:
+    """
+    Store the strip `render()` produces under `strip_id` unless it already exists.
+    A request for an ID that is being rendered by another thread waits for that
+    render instead of starting its own.
+    """
+    with _inflight_lock:
+        pending = _inflight.get(strip_id)
+    # An in-flight render may not have finished storing, so it goes before the exists shortcut
+    if pending is None and store.exists(strip_key(strip_id)):
+        metrics.inc("compose.dedup")
+        _refresh_expiry(strip_id)
+        mark_served(strip_id)
+        return strip_id
+    if pending is None:
+        with _inflight_lock:
+            pending = _inflight.get(strip_id)
+            if pending is None:
+                _inflight[strip_id] = owned = Future()
+    if pending is not None:
+        metrics.inc("compose.dedup_wait")
+        return pending.result()
+    try:
+        if not store.exists(strip_key(strip_id)):
+            size, bands = render()
+            store_strip(size, bands, strip_id)
+        owned.set_result(strip_id)
+    except BaseException as e:
+        owned.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[strip_id]
+    return strip_id
+
+def store_strip(size: Tuple[int, int], bands: Iterator[Image.Image], strip_id: str | None = None) -> str:
+    """
+    Encode composed bands with the fast PNG level and store them, building the
+    smaller renditions in the same pass, then queue re-optimization.
+    """
+    sid = strip_id or str(uuid.uuid4())
+    renditions = RenditionBuilder(size)
+    written = 0
+
+    def full_strip() -> Iterator[bytes]:
+        nonlocal written
+        yield from iter_png(size, renditions.tap(bands), level=FAST_LEVEL)
+        # put() only publishes the full strip once this generator is exhausted, so the
+        # renditions are in place before anyone can see the strip and look for them
+        for name, img in renditions.finish():
+            written += store.put(strip_key(sid, name), iter_png(img.size, [img], level=FAST_LEVEL))
+
+    written += store.put(strip_key(sid), full_strip())
+    if store.root:
+        # Expires the strip with everything later written next to it (renditions, transcodes)
+        expiry_index(store.root).add(strip_entry(sid), STRIP_TTL)
+    _track(sid, written)
+    _set_tier(sid, "fast")
+    metrics.inc("compose.fast")
+    metrics.inc("optimize.queued")
+    _optimizer.submit(_optimize, sid)
+    return sid
+
+def preview_url(strip_id: str, fmt: str = "png", quality: int | None = None) -> str:
+    url = f"/api/v1/strips/preview/{strip_id}"
+    if fmt != "png":
+        url += f"?format={fmt}&quality={quality}"
+    return url
@@ -0,0 +1,36 @@
+import base64, io, os, sys, tempfile
+
+# Services read their configuration at import time, so point them at a scratch
+# tmp directory before anything under services/ or api/ is imported
+os.environ.setdefault("TMP_DIR", tempfile.mkdtemp(prefix="boothbuddy-tests-"))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from flask import Flask
+from PIL import Image
+from services.json_provider import install_json_provider
+
+def encode(img: Image.Image, fmt: str = "PNG", **params) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **params)
+    return buf.getvalue()
+
+def data_url(img: Image.Image, fmt: str = "PNG", **params) -> str:
+    return f"data:image/{fmt.lower()};base64," + base64.b64encode(encode(img, fmt, **params)).decode()
+
+@pytest.fixture(scope="session")
+def app():
+    """The API blueprints on a bare app (photos needs Supabase credentials, so it is left out)"""
+    from api.v1.filters import bp as filters_bp
+    from api.v1.jobs import bp as jobs_bp
+    from api.v1.render import bp as render_bp
+    from api.v1.strips import bp as strips_bp
+    app = Flask(__name__)
+    install_json_provider(app)
+    for bp in (strips_bp, filters_bp, render_bp, jobs_bp):
+        app.register_blueprint(bp)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
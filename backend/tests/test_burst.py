@@ -0,0 +1,37 @@
+import pytest
+from PIL import Image, ImageFilter
+from conftest import data_url, encode
+from services.burst import pick_sharpest
+from services.codec import FrameHandle
+
+def _candidates(fmt, mode="RGB"):
+    sharp = Image.effect_mandelbrot((640, 360), (-2.0, -1.0, 1.0, 1.0), 100).convert("RGB")
+    blurred = [sharp.filter(ImageFilter.BoxBlur(r)) if r else sharp for r in (3, 0, 1.5)]
+    return [FrameHandle.open(encode(img.convert(mode), fmt)) for img in blurred]
+
+@pytest.mark.parametrize("fmt,mode", [("JPEG", "RGB"), ("PNG", "RGB"), ("PNG", "P"), ("WEBP", "RGB")])
+def test_pick_sharpest_prefers_unblurred_frame(fmt, mode):
+    winners, scores = pick_sharpest([_candidates(fmt, mode), _candidates(fmt, mode)[::-1]])
+    assert winners == [1, 1]
+    assert len(scores) == 2 and all(len(s) == 3 for s in scores)
+
+def test_burst_endpoint_composes_winners(client):
+    sharp = Image.effect_mandelbrot((320, 180), (-2.0, -1.0, 1.0, 1.0), 100).convert("RGB")
+    slots = [[data_url(sharp.filter(ImageFilter.BoxBlur(2)), "JPEG"), data_url(sharp, "JPEG")]] * 4
+    res = client.post("/api/v1/strips/burst", json={"slots": slots, "frameWidth": 160})
+    assert res.status_code == 200, res.get_json()
+    assert res.get_json()["selected"] == [1, 1, 1, 1]
+
+@pytest.mark.parametrize("params", [{"frameWidth": -5}, {"padding": -500}, {"frameWidth": "wide"}])
+def test_burst_rejects_bad_params(client, params):
+    slots = [[data_url(Image.new("RGB", (64, 48), "navy"), "JPEG")]] * 4
+    res = client.post("/api/v1/strips/burst", json={"slots": slots, **params})
+    assert res.status_code == 400
+    assert res.get_json()["error"]["code"] == "bad_request"
+
+def test_burst_params_hash_the_same_as_strings_or_numbers(client):
+    slots = [[data_url(Image.new("RGB", (64, 48), "navy"), "JPEG")]] * 4
+    a = client.post("/api/v1/strips/burst", json={"slots": slots, "frameWidth": 32, "padding": 200})
+    b = client.post("/api/v1/strips/burst", json={"slots": slots, "frameWidth": "32", "padding": "200"})
+    assert a.status_code == b.status_code == 200
+    assert a.get_json()["stripId"] == b.get_json()["stripId"]
@@ -0,0 +1,51 @@
+import pytest
+from PIL import Image
+from conftest import data_url, encode
+from services.codec import FrameHandle, InvalidImage, decode_image
+
+# Every mode Pillow writes to PNG, with and without a transparent colour key
+PNG_MODES = [
+    ("1", {}), ("L", {}), ("L", {"transparency": 0}), ("LA", {}), ("P", {}),
+    ("P", {"transparency": 0}), ("RGB", {}), ("RGB", {"transparency": (0, 0, 0)}),
+    ("RGBA", {}), ("I", {}), ("I;16", {}),
+]
+
+def _png(mode, params, size=(640, 480)):
+    return encode(Image.new(mode, size), "PNG", **params)
+
+@pytest.mark.parametrize("mode,params", PNG_MODES)
+@pytest.mark.parametrize("target", [None, (160, 120)])
+@pytest.mark.parametrize("out", ["RGBA", "L"])
+def test_decode_every_png_mode(mode, params, target, out):
+    img = decode_image(_png(mode, params), target, out)
+    assert img.mode == out
+    assert img.size == (target or (640, 480))
+
+@pytest.mark.parametrize("mode,params", [m for m in PNG_MODES if m[1]])
+def test_downscale_keeps_colour_key_transparency(mode, params):
+    assert decode_image(_png(mode, params), (160, 120)).getpixel((0, 0))[3] == 0
+
+def test_frame_handle_reads_header_only():
+    handle = FrameHandle.open(data_url(Image.new("RGB", (320, 240)), "JPEG"))
+    assert (handle.size, handle.format) == ((320, 240), "JPEG")
+    assert handle.decode((80, 60)).size == (80, 60)
+
+@pytest.mark.parametrize("mode,params", PNG_MODES)
+def test_compose_downscales_every_png_mode(client, mode, params):
+    frames = [data_url(Image.new(mode, (640, 480)), "PNG", **params)] * 4
+    res = client.post("/api/v1/strips/compose", json={"frames": frames, "frameWidth": 160})
+    assert res.status_code == 200, res.get_json()
+    assert client.get(res.get_json()["previewUrl"]).status_code == 200
+
+@pytest.mark.parametrize("src", [
+    "data:image/png;base64,AAAA", "not a data url", b"\x89PNG\r\n\x1a\nxx",
+    "data:image/png;base64,iVBOR\u00e9w0KGgo=", "data:image/png;base64,A",
+])
+def test_invalid_input_raises_invalid_image(src):
+    with pytest.raises(InvalidImage):
+        decode_image(src)
+
+def test_filters_reject_non_ascii_data_url(client):
+    res = client.post("/api/v1/filters/apply", json={"images": ["data:image/png;base64,\u00e9\u00e9"], "filterType": "sepia"})
+    assert res.status_code == 400
+    assert res.get_json()["error"]["code"] == "invalid_image"
@@ -0,0 +1,79 @@
+import base64, io
+import pytest
+from PIL import Image
+from conftest import data_url, encode
+from services.compose import MAX_FRAME_WIDTH, plan_frame_sizes
+
+FRAME = data_url(Image.new("RGB", (64, 48), "navy"))
+
+@pytest.mark.parametrize("params", [
+    {"frameWidth": -5},
+    {"frameWidth": 0},
+    {"frameWidth": MAX_FRAME_WIDTH + 1},
+    {"frameWidth": 2.5},
+    {"padding": -500},
+    {"padding": 100_000},
+    {"layout": "grid", "rows": -2},
+    {"frameWidth": MAX_FRAME_WIDTH, "padding": 512},  # each frame fits, the 4-high strip does not
+])
+def test_out_of_range_params_are_rejected(client, params):
+    res = client.post("/api/v1/strips/compose", json={"frames": [FRAME] * 4, **params})
+    assert res.status_code == 400, res.get_json()
+    assert res.get_json()["error"]["code"] == "bad_request"
+
+def test_string_and_numeric_params_compose_the_same_strip(client):
+    a = client.post("/api/v1/strips/compose", json={"frames": [FRAME] * 4, "frameWidth": 32, "padding": 4})
+    b = client.post("/api/v1/strips/compose", json={"frames": [FRAME] * 4, "frameWidth": "32", "padding": "4"})
+    assert a.status_code == b.status_code == 200
+    assert a.get_json()["stripId"] == b.get_json()["stripId"]
+
+def test_planned_frames_are_never_empty_or_oversized():
+    assert plan_frame_sizes([(4000, 10)], 40) == [(40, 1)]
+    with pytest.raises(ValueError):
+        plan_frame_sizes([(10, 4000)], MAX_FRAME_WIDTH)
+
+def _pngs(count=4):
+    return [encode(Image.new("RGB", (64, 48), (40 * i, 80, 160))) for i in range(count)]
+
+def _json_strip_id(client, frames, **params):
+    res = client.post("/api/v1/strips/compose",
+                      json={"frames": [f"data:image/png;base64,{base64.b64encode(f).decode()}" for f in frames],
+                            **params})
+    assert res.status_code == 200, res.get_json()
+    return res.get_json()["stripId"]
+
+def test_multipart_upload_composes_the_json_strip(client):
+    frames = _pngs()
+    res = client.post("/api/v1/strips/compose", content_type="multipart/form-data", data={
+        "frames": [(io.BytesIO(f), f"{i}.png") for i, f in enumerate(frames)],
+        "frameWidth": "32", "padding": "4",
+    })
+    assert res.status_code == 200, res.get_json()
+    assert res.get_json()["stripId"] == _json_strip_id(client, frames, frameWidth=32, padding=4)
+
+def test_octet_stream_upload_is_split_by_frame_lengths(client):
+    frames = _pngs()
+    res = client.post("/api/v1/strips/compose?frameWidth=32&padding=4", data=b"".join(frames),
+                      content_type="application/octet-stream",
+                      headers={"X-Frame-Lengths": ",".join(str(len(f)) for f in frames)})
+    assert res.status_code == 200, res.get_json()
+    assert res.get_json()["stripId"] == _json_strip_id(client, frames, frameWidth=32, padding=4)
+
+def test_octet_stream_single_frame_needs_no_lengths(client):
+    frame, = _pngs(1)
+    res = client.post("/api/v1/strips/compose", data=frame, content_type="application/octet-stream")
+    assert res.status_code == 200, res.get_json()
+    assert res.get_json()["stripId"] == _json_strip_id(client, [frame])
+
+@pytest.mark.parametrize("lengths", [
+    lambda sizes: ",".join(str(n) for n in sizes[:-1]),  # a frame short
+    lambda sizes: ",".join(str(n + 1) for n in sizes),  # more than the body
+    lambda sizes: ",".join(["0"] + [str(n) for n in sizes]),  # an empty frame
+    lambda sizes: "many",
+])
+def test_octet_stream_rejects_mismatched_frame_lengths(client, lengths):
+    frames = _pngs()
+    res = client.post("/api/v1/strips/compose", data=b"".join(frames), content_type="application/octet-stream",
+                      headers={"X-Frame-Lengths": lengths([len(f) for f in frames])})
+    assert res.status_code == 400
+    assert res.get_json()["error"]["code"] == "bad_request"
@@ -0,0 +1,118 @@
+import os, threading, time
+from PIL import Image
+from services import strip_store
+from services.codec import FrameHandle
+from services.expiry import BUCKET_SECONDS, expiry_index
+from services.strip_store import content_id, store, store_once, strip_entry, strip_key
+from conftest import encode
+
+def _frames(seed=0):
+    return [FrameHandle.open(encode(Image.new("RGB", (32, 24), (seed, i, 0)))) for i in range(4)]
+
+def _render(calls, delay=0.0):
+    def render():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return (32, 96), iter([Image.new("RGB", (32, 96), "white")])
+    return render
+
+def test_content_id_depends_on_frames_and_params():
+    frames = _frames()
+    assert content_id(frames, padding=16) == content_id(_frames(), padding=16)
+    assert content_id(frames, padding=16) != content_id(frames, padding=8)
+    assert content_id(frames, padding=16) != content_id(_frames(1), padding=16)
+    assert content_id(frames, frameWidth=None) == content_id(frames)
+
+def test_concurrent_duplicates_wait_for_one_render():
+    sid = content_id(_frames(2), test="concurrent")
+    calls, results = [], []
+    threads = [threading.Thread(target=lambda: results.append(store_once(sid, _render(calls, 0.2))))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [sid] * 4
+    assert len(calls) == 1
+    assert store.exists(strip_key(sid))
+    assert not strip_store._inflight
+
+def test_failed_render_is_not_cached():
+    sid = content_id(_frames(3), test="failure")
+    def broken():
+        raise RuntimeError("boom")
+    try:
+        store_once(sid, broken)
+    except RuntimeError:
+        pass
+    calls = []
+    assert store_once(sid, _render(calls)) == sid
+    assert len(calls) == 1
+
+def test_dedup_hit_refreshes_expiry():
+    sid = content_id(_frames(4), test="refresh")
+    store_once(sid, _render([]))
+    # Age the strip as if it had been written a full TTL ago
+    folder = os.path.dirname(os.path.join(store.root, strip_key(sid)))
+    stale = time.time() - strip_store.STRIP_TTL - BUCKET_SECONDS
+    for name in os.listdir(folder):
+        os.utime(os.path.join(folder, name), (stale, stale))
+    expiry_index(store.root).add(strip_entry(sid), strip_store.STRIP_TTL, now=stale)
+    calls = []
+    assert store_once(sid, _render(calls)) == sid
+    assert not calls
+    expiry_index(store.root).sweep()
+    assert os.path.exists(os.path.join(store.root, strip_key(sid)))
+    expiry_index(store.root).sweep(time.time() + strip_store.STRIP_TTL + BUCKET_SECONDS)
+    assert not os.path.exists(os.path.join(store.root, strip_key(sid)))
+
+def test_strip_deleted_by_expiry_is_rendered_again():
+    sid = content_id(_frames(5), test="expired")
+    store_once(sid, _render([]))
+    with store.get(strip_key(sid)) as fh:
+        fh.read()  # now hot in the cache
+    expiry_index(store.root).remove(strip_entry(sid))
+    assert not store.exists(strip_key(sid))
+    calls = []
+    assert store_once(sid, _render(calls)) == sid
+    assert len(calls) == 1
+
+def test_renditions_are_stored_before_the_full_strip_appears(monkeypatch):
+    sid = content_id(_frames(6), test="renditions")
+    seen = []
+    put = store.put
+
+    def recording_put(key, chunks):
+        size = put(key, chunks)
+        if sid in key:  # the optimizer may be rewriting strips from earlier tests meanwhile
+            seen.append((key, store.exists(strip_key(sid))))
+        return size
+    monkeypatch.setattr(store, "put", recording_put)
+    store_once(sid, lambda: ((200, 800), iter([Image.new("RGB", (200, 800), "white")])))
+    assert [key for key, _ in seen] == [strip_key(sid, "thumb"), strip_key(sid, "placeholder"), strip_key(sid)]
+    assert not any(full_visible for _, full_visible in seen[:-1])
+
+def test_duplicate_waits_for_the_inflight_render_even_once_the_strip_exists(monkeypatch):
+    sid = content_id(_frames(7), test="inflight")
+    owned = strip_store.Future()
+    monkeypatch.setitem(strip_store._inflight, sid, owned)
+    monkeypatch.setattr(store, "exists", lambda key: True)
+    waiter = threading.Thread(target=store_once, args=(sid, _render([])))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()  # not answered from the exists() shortcut
+    owned.set_result(sid)
+    waiter.join(5)
+    assert not waiter.is_alive()
+
+def test_migrate_flat_layout_moves_strips_into_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(strip_store, "TMP_DIR", str(tmp_path))
+    sid = "abcdef01-2345-4678-9abc-def012345678"
+    names = [f"{sid}.png", f"{sid}.thumb.png", f"{sid}.q80.webp"]
+    for name in names + [f"{sid}.png.x1y2.part", "notes.txt"]:
+        (tmp_path / name).write_bytes(b"png")
+    assert strip_store.migrate_flat_layout() == 3
+    assert sorted(os.listdir(tmp_path / "ab" / "cd")) == sorted(names)
+    assert (tmp_path / "ab" / "cd" / f"{sid}.thumb.png").read_bytes() == b"png"
+    assert sorted(os.listdir(tmp_path)) == sorted(["ab", f"{sid}.png.x1y2.part", "notes.txt"])
+    assert strip_store.migrate_flat_layout() == 0
@@ -0,0 +1,41 @@
+import io
+import pytest
+from conftest import data_url, encode
+from PIL import Image
+from services.compose import stream_layout
+from services.encode import iter_png, negotiate_format
+
+def _photo(seed: int) -> Image.Image:
+    return Image.effect_mandelbrot((96, 72), (-2.0 + seed / 4, -1.0, 1.0, 1.0), 60).convert("RGB")
+
+@pytest.mark.parametrize("fmt", [1, ["png"], {"f": "png"}, True])
+def test_non_string_format_is_a_value_error(fmt):
+    with pytest.raises(ValueError):
+        negotiate_format(fmt=fmt)
+
+def test_non_string_format_is_a_bad_request(client):
+    frames = [data_url(Image.new("RGB", (32, 24), "navy"))] * 4
+    res = client.post("/api/v1/strips/compose", json={"frames": frames, "format": 1})
+    assert res.status_code == 400
+    assert res.get_json()["error"]["code"] == "bad_request"
+
+@pytest.mark.parametrize("band_rows", [1, 7, 64, 10_000])
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_iter_png_round_trips_any_banding(band_rows, mode):
+    image = _photo(0).convert(mode)
+    bands = [image.crop((0, y, image.width, min(image.height, y + band_rows)))
+             for y in range(0, image.height, band_rows)]
+    decoded = Image.open(io.BytesIO(b"".join(iter_png(image.size, bands, mode=mode))))
+    assert decoded.mode == mode and decoded.size == image.size
+    assert decoded.tobytes() == image.tobytes()
+
+def test_streamed_strip_matches_a_composed_canvas():
+    frames = [_photo(i) for i in range(4)]
+    padding = 10
+    canvas = Image.new("RGBA", (96, 4 * 72 + 3 * padding), (255, 255, 255, 255))
+    for i, frame in enumerate(frames):
+        canvas.paste(frame, (0, i * (72 + padding)))
+    size, bands = stream_layout([encode(f) for f in frames], padding=padding, band_rows=50)
+    decoded = Image.open(io.BytesIO(b"".join(iter_png(size, bands))))
+    assert decoded.size == canvas.size
+    assert decoded.tobytes() == canvas.tobytes()
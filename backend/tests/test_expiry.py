@@ -0,0 +1,60 @@
+import os, time
+from services.expiry import BUCKET_SECONDS, ExpiryIndex
+
+def _write(root, name, size=10, age=0.0):
+    path = os.path.join(root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(b"x" * size)
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+    return path
+
+def test_sweep_removes_expired_entry_with_siblings(tmp_path):
+    root = str(tmp_path)
+    index = ExpiryIndex(root)
+    for name in ("ab/cd/abcd1.png", "ab/cd/abcd1.thumb.png", "ab/cd/abcd1.q80.webp"):
+        _write(root, name, age=120)
+    keep = _write(root, "ab/cd/abcd2.png", age=120)
+    index.add("ab/cd/abcd1", 60, now=time.time() - 120)
+    removed = []
+    files, reclaimed = index.sweep(time.time() + BUCKET_SECONDS, on_remove=removed.append)
+    assert (files, reclaimed, removed) == (3, 30, ["ab/cd/abcd1"])
+    assert os.listdir(os.path.join(root, "ab/cd")) == [os.path.basename(keep)]
+
+def test_sweep_leaves_buckets_in_the_future(tmp_path):
+    root = str(tmp_path)
+    path = _write(root, "result.png")
+    ExpiryIndex(root).add("result.png", 60)
+    assert ExpiryIndex(root).sweep() == (0, 0)
+    assert os.path.exists(path)
+
+def test_sweep_keeps_entry_written_again_since(tmp_path):
+    """An old bucket line must not delete a strip re-created under the same ID"""
+    root = str(tmp_path)
+    index = ExpiryIndex(root)
+    index.add("ab/cd/abcd1", 60, now=time.time() - 2 * BUCKET_SECONDS)
+    path = _write(root, "ab/cd/abcd1.png")
+    assert index.sweep() == (0, 0)
+    assert os.path.exists(path)
+    # The stale line is consumed with its bucket; the re-created strip expires from its own line
+    index.add("ab/cd/abcd1", 60)
+    assert index.sweep(time.time() + BUCKET_SECONDS + 60) == (1, 10)
+
+def test_sweep_expires_lines_without_ttl(tmp_path):
+    root = str(tmp_path)
+    index = ExpiryIndex(root)
+    path = _write(root, "old.png")
+    os.makedirs(index.dir)
+    with open(os.path.join(index.dir, f"{int(time.time() // BUCKET_SECONDS) - 1}.idx"), "w") as fh:
+        fh.write("old.png\n")
+    assert index.sweep() == (1, 10)
+    assert not os.path.exists(path)
+
+def test_remove_ignores_entries_outside_root(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    outside = _write(str(tmp_path), "victim.png")
+    assert ExpiryIndex(str(root)).remove("../victim") == (0, 0)
+    assert os.path.exists(outside)
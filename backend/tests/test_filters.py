@@ -0,0 +1,39 @@
+import pytest
+from PIL import Image
+from conftest import data_url
+from services.filters import apply_filter
+
+def test_apply_has_no_frame_limit(client):
+    images = [data_url(Image.new("RGB", (16, 16), (i * 10, 0, 0))) for i in range(13)]
+    res = client.post("/api/v1/filters/apply", json={"images": images, "filterType": "grayscale"})
+    assert res.status_code == 200, res.get_json()
+    assert len(res.get_json()["filteredImages"]) == 13
+
+def test_bad_filter_type_is_rejected_before_the_images(client):
+    body = b'{"filterType": "nope", "images": ["data:image/png;base64,' + b"A" * 100_000
+    res = client.post("/api/v1/filters/apply", data=body, content_type="application/json")
+    assert res.status_code == 400
+    assert res.get_json()["error"]["message"] == "Invalid filterType"
+
+SKIN = (224, 172, 140)
+
+def _green_screen(bg, size=(200, 150)):
+    """A subject (skin tone) in front of a screen of colour `bg`, lit unevenly from the left"""
+    img = Image.new("RGB", size, bg)
+    shade = Image.linear_gradient("L").rotate(90).resize(size).point(lambda v: 160 + v * 95 // 255)
+    img = Image.composite(img, Image.new("RGB", size, "black"), shade)  # 63-100% brightness
+    img.paste(SKIN, (60, 40, 140, 150))
+    return img
+
+@pytest.mark.parametrize("bg", [(0, 177, 64), (60, 170, 70), (40, 120, 50), (0, 255, 0), (30, 200, 120)])
+def test_chromakey_keys_realistic_greens_at_default_intensity(bg):
+    out = apply_filter(_green_screen(bg), "chromakey", 1.0, backdrop="black")
+    screen = out.crop((0, 0, 50, 150)).convert("L")
+    assert screen.getextrema()[1] <= 8, f"{bg} left unkeyed"
+    assert out.getpixel((100, 100))[:3] == SKIN
+
+def test_chromakey_keeps_frames_without_a_screen():
+    img = Image.linear_gradient("L").resize((120, 90)).convert("RGB")
+    img.paste(SKIN, (30, 20, 90, 90))
+    out = apply_filter(img, "chromakey", 1.0, backdrop="black")
+    assert out.convert("RGB").tobytes() == img.tobytes()
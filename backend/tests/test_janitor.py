@@ -0,0 +1,45 @@
+import os, time
+from services.janitor import Janitor
+
+def _write(root, name, size, age=0.0):
+    path = os.path.join(root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(b"x" * size)
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+
+def test_scan_does_not_count_recorded_files_twice(tmp_path):
+    root = str(tmp_path)
+    _write(root, "ab/cd/abcd1.png", 100, age=60)
+    _write(root, "ab/cd/abcd1.thumb.png", 20, age=60)
+    janitor = Janitor([root], interval=60, max_bytes=0)
+    # Written and recorded while the start-up scan is still walking
+    _write(root, "ab/cd/abcd2.png", 50)
+    janitor.record(root, "ab/cd/abcd2", 50)
+    janitor._scan()
+    assert janitor._usage == 170
+    assert list(janitor._entries.items()) == [((root, "ab/cd/abcd1"), 120), ((root, "ab/cd/abcd2"), 50)]
+
+def test_scan_keeps_recent_records_most_recently_used(tmp_path):
+    root = str(tmp_path)
+    _write(root, "ab/cd/abcd1.png", 100, age=60)
+    janitor = Janitor([root], interval=60, max_bytes=0)
+    # An old strip served again during the scan: its transcode is new, the strip is not
+    _write(root, "ab/cd/abcd1.q80.webp", 30)
+    janitor.record(root, "ab/cd/abcd1", 30)
+    _write(root, "ab/cd/abcd2.png", 50, age=120)
+    janitor._scan()
+    assert list(janitor._entries.items()) == [((root, "ab/cd/abcd2"), 50), ((root, "ab/cd/abcd1"), 130)]
+
+def test_budget_evicts_least_recently_served(tmp_path):
+    root = str(tmp_path)
+    janitor = Janitor([root], interval=60, max_bytes=120)
+    for i, name in enumerate(("ab/cd/abcd1", "ab/cd/abcd2", "ab/cd/abcd3")):
+        _write(root, f"{name}.png", 50)
+        janitor.record(root, name, 50)
+    janitor.touch(root, "ab/cd/abcd1")
+    janitor.run_once()
+    assert sorted(os.listdir(os.path.join(root, "ab/cd"))) == ["abcd1.png", "abcd3.png"]
+    assert janitor._usage == 100
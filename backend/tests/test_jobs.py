@@ -0,0 +1,114 @@
+import itertools, sys, threading, time
+import pytest
+from PIL import Image
+from services import jobs
+from conftest import data_url
+
+_seeds = itertools.count()
+
+def _body(seed):
+    """Distinct frames per job, so no job is answered from the dedup cache"""
+    return {"frames": [data_url(Image.new("RGB", (64, 48), (seed, 40 * i, 0))) for i in range(4)],
+            "filters": [{"type": "sepia"}]}
+
+def _wait(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/jobs/{job_id}").get_json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"job {job_id} did not finish")
+
+def _events(res):
+    events = []
+    for block in res.get_data(as_text=True).strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((int(fields["id"]), fields["event"]))
+    return events
+
+@pytest.fixture
+def done_job(client):
+    res = client.post("/api/v1/jobs", json=_body(next(_seeds)))
+    assert res.status_code == 202
+    body = res.get_json()
+    assert body["statusUrl"] == f"/api/v1/jobs/{body['jobId']}"
+    return _wait(client, body["jobId"])
+
+def test_job_lifecycle_by_polling(client, done_job):
+    assert done_job["status"] == "done"
+    assert done_job["previewUrl"].endswith(done_job["stripId"])
+    progress = done_job["progress"]
+    assert progress["encode"] == progress["compose"] == {"done": 4, "total": 4}  # 240 px / 64 px bands
+    assert client.get(done_job["previewUrl"]).status_code == 200
+
+def test_events_replay_in_order(client, done_job):
+    events = _events(client.get(f"/api/v1/jobs/{done_job['jobId']}/events"))
+    assert [i for i, _ in events] == list(range(len(events)))
+    assert events[0][1] == "status" and events[-1][1] == "done"
+    assert {"progress"} == {e for _, e in events[1:-1]}
+    assert len(events) > 3
+
+@pytest.mark.parametrize("header,first", [("2", 3), ("not-a-number", 0), ("-7", 0)])
+def test_events_resume_after_last_event_id(client, done_job, header, first):
+    res = client.get(f"/api/v1/jobs/{done_job['jobId']}/events", headers={"Last-Event-ID": header})
+    assert res.status_code == 200
+    assert _events(res)[0][0] == first
+
+def test_status_can_be_read_while_progress_is_reported():
+    job = jobs.Job()
+    stop = threading.Event()
+
+    def report():
+        i = 0
+        while not stop.is_set():
+            job.progress(f"stage{i % 500}", 500)
+            i += 1
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to hit the race
+    reporter = threading.Thread(target=report)
+    reporter.start()
+    try:
+        for _ in range(2000):
+            job.to_dict()
+    finally:
+        stop.set()
+        reporter.join()
+        sys.setswitchinterval(interval)
+
+def test_failed_job_reports_error(client):
+    def work(job):
+        job.progress("decode", 2)
+        raise RuntimeError("boom")
+    job = jobs.submit(work)
+    body = _wait(client, job.id)
+    assert body["status"] == "failed"
+    assert body["error"] == {"code": "processing_error", "message": "boom"}
+
+def test_queue_full(client, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(jobs, "_slots", slots)
+    res = client.post("/api/v1/jobs", json=_body(next(_seeds)))
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "5"
+    assert res.get_json()["error"]["code"] == "queue_full"
+
+def test_unknown_job_is_404(client):
+    assert client.get("/api/v1/jobs/nope").status_code == 404
+    assert client.get("/api/v1/jobs/nope/events").status_code == 404
+
+@pytest.mark.parametrize("endpoint", ["/api/v1/render", "/api/v1/jobs"])
+@pytest.mark.parametrize("params", [
+    {"frameWidth": -5}, {"frameWidth": "wide"}, {"padding": -500},
+    {"layout": "grid", "rows": "two"}, {"layout": "grid", "cols": 0},
+])
+def test_bad_params_are_rejected_before_rendering(client, endpoint, params):
+    res = client.post(endpoint, json={**_body(next(_seeds)), **params})
+    assert res.status_code == 400
+    assert res.get_json()["error"]["code"] == "bad_request"
+
+def test_render_accepts_string_rows_and_cols(client):
+    res = client.post("/api/v1/render", json={**_body(next(_seeds)), "layout": "grid", "rows": "2", "cols": "2"})
+    assert res.status_code == 200, res.get_json()
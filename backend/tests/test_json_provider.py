@@ -0,0 +1,32 @@
+import json, uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from services.json_provider import FastJSONProvider, install_json_provider, orjson
+
+PAYLOAD = {
+    "b": [1, 2.5, None, True],
+    "a": {"when": datetime(2024, 6, 1, 12, 30, tzinfo=timezone.utc), "id": uuid.UUID(int=7)},
+    "price": Decimal("1.10"),
+    "big": 2 ** 70,
+    "ascii": "photo strip",
+}
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_matches_default_provider():
+    app = Flask(__name__)
+    fast, default = FastJSONProvider(app), DefaultJSONProvider(app)
+    assert json.loads(fast.dumps(PAYLOAD)) == json.loads(default.dumps(PAYLOAD))
+    assert list(json.loads(fast.dumps({"z": 1, "a": 2}))) == ["a", "z"]
+    assert fast.loads('{"x": [1, "\\u00e9"]}') == {"x": [1, "é"]}
+    with app.app_context():
+        assert json.loads(fast.response(PAYLOAD).data) == json.loads(default.response(PAYLOAD).data)
+
+def test_install_logs_active_provider(caplog):
+    app = Flask(__name__)
+    with caplog.at_level("INFO", logger="services.json_provider"):
+        install_json_provider(app)
+    assert isinstance(app.json, FastJSONProvider) == (orjson is not None)
+    assert "orjson" in caplog.text
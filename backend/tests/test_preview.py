@@ -0,0 +1,61 @@
+import pytest
+from PIL import Image
+from services import strip_store
+from services.strip_store import store_strip
+
+@pytest.fixture
+def strip_id():
+    sid = store_strip((64, 256), iter([Image.new("RGB", (64, 256), "white")]))
+    strip_store._optimizer.submit(lambda: None).result()  # let the queued re-optimization finish
+    return sid
+
+def _preview(client, sid, query="", **headers):
+    return client.get(f"/api/v1/strips/preview/{sid}{query}", headers=headers)
+
+def test_etag_and_not_modified(client, strip_id):
+    res = _preview(client, strip_id)
+    assert res.status_code == 200 and res.mimetype == "image/png"
+    etag = res.headers["ETag"]
+    assert not etag.startswith("W/")
+    res = _preview(client, strip_id, **{"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+
+def test_range_request(client, strip_id):
+    full = _preview(client, strip_id).data
+    res = _preview(client, strip_id, Range="bytes=0-9")
+    assert res.status_code == 206
+    assert res.data == full[:10]
+    assert res.headers["Content-Range"] == f"bytes 0-9/{len(full)}"
+
+def test_optimized_png_is_immutable(client, strip_id):
+    res = _preview(client, strip_id)
+    assert res.headers["X-Strip-Tier"] == "optimized"
+    assert res.cache_control.immutable and res.cache_control.max_age > 0
+    assert not res.cache_control.no_cache
+
+@pytest.mark.parametrize("tier", ["fast", None])
+def test_png_that_may_still_change_is_revalidated(client, strip_id, tier):
+    # None: a worker that never saw this strip (or restarted) has no tier for it
+    with strip_store._tiers_lock:
+        if tier:
+            strip_store._tiers[strip_id] = tier
+        else:
+            strip_store._tiers.pop(strip_id, None)
+    res = _preview(client, strip_id)
+    assert res.headers["X-Strip-Tier"] == (tier or "unknown")
+    assert res.cache_control.no_cache
+    assert not res.cache_control.immutable
+
+def test_transcode_is_immutable_and_varies_on_accept(client, strip_id):
+    res = _preview(client, strip_id, **{"Accept": "image/webp,*/*"})
+    assert res.mimetype == "image/webp"
+    assert res.cache_control.immutable
+    assert "Accept" in res.headers["Vary"]
+    explicit = _preview(client, strip_id, "?format=jpeg&quality=70")
+    assert explicit.mimetype == "image/jpeg"
+    assert "Accept" not in explicit.headers.get("Vary", "")
+
+def test_unknown_strip_is_404(client):
+    assert _preview(client, "0000aaaa").status_code == 404
+    assert _preview(client, "../../etc").status_code == 404
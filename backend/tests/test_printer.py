@@ -0,0 +1,66 @@
+import io, struct
+import pytest
+from PIL import Image
+from services.printer import BAND_ROWS, ESC_INIT, FEED_AND_CUT, PAPER_DOTS, FileSink, iter_escpos
+from services.strip_store import store_strip
+
+def _strip(size=(300, 500)):
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    img.paste((255, 0, 0), (0, 0, size[0] // 2, size[1] // 4))
+    return img
+
+def _bands(data: bytes):
+    """Split an ESC/POS job into its GS v 0 raster bands: [(width_bytes, rows), ...]"""
+    assert data.startswith(ESC_INIT) and data.endswith(FEED_AND_CUT)
+    body, bands = data[len(ESC_INIT):-len(FEED_AND_CUT)], []
+    while body:
+        assert body[:4] == b"\x1d\x76\x30\x00"
+        width_bytes, rows = struct.unpack("<HH", body[4:8])
+        body = body[8 + width_bytes * rows:]
+        bands.append((width_bytes, rows))
+    return bands
+
+@pytest.mark.parametrize("paper", [58, 80])
+@pytest.mark.parametrize("dither", ["floyd-steinberg", "ordered"])
+def test_file_sink_receives_banded_raster(tmp_path, paper, dither):
+    sink = tmp_path / "lp0"
+    written = FileSink(str(sink)).write(iter_escpos(_strip(), paper, dither))
+    data = sink.read_bytes()
+    assert written == len(data)
+    bands = _bands(data)
+    dots = PAPER_DOTS[paper]
+    height = round(500 * dots / 300)
+    assert {w for w, _ in bands} == {dots // 8}
+    assert [r for _, r in bands[:-1]] == [BAND_ROWS] * (len(bands) - 1)
+    assert sum(r for _, r in bands) == height
+
+def test_file_sink_appends(tmp_path):
+    sink = FileSink(str(tmp_path / "lp0"))
+    first = sink.write(iter_escpos(_strip((100, 50))))
+    second = sink.write(iter_escpos(_strip((100, 50))))
+    assert (tmp_path / "lp0").stat().st_size == first + second
+
+def test_encoded_source_is_closed_after_streaming():
+    buf = io.BytesIO()
+    _strip().save(buf, format="PNG")
+    buf.seek(0)
+    chunks = iter_escpos(buf)
+    assert not buf.closed
+    _bands(b"".join(chunks))
+    assert buf.closed
+
+def test_rejects_unknown_options():
+    with pytest.raises(ValueError):
+        iter_escpos(_strip(), paper_mm=110)
+    with pytest.raises(ValueError):
+        iter_escpos(_strip(), dither="atkinson")
+
+def test_print_endpoint_writes_to_device(client, tmp_path, monkeypatch):
+    sid = store_strip((300, 500), iter([_strip()]))
+    monkeypatch.setenv("PRINTER_DEVICE", str(tmp_path / "lp0"))
+    res = client.post(f"/api/v1/strips/print/{sid}", json={"paper": 80, "dither": "ordered"})
+    assert res.status_code == 200
+    assert res.get_json()["bytes"] == (tmp_path / "lp0").stat().st_size
+    streamed = client.get(f"/api/v1/strips/escpos/{sid}?paper=80&dither=ordered").data
+    assert streamed == (tmp_path / "lp0").read_bytes()
+    assert client.get(f"/api/v1/strips/escpos/{sid}?paper=12").status_code == 400
@@ -0,0 +1,35 @@
+import pytest
+from PIL import Image, ImageChops, ImageStat
+from services.renditions import RenditionBuilder, _BandScaler, rendition_sizes
+
+def _strip(size=(300, 1100)) -> Image.Image:
+    return Image.effect_mandelbrot(size, (-2.0, -1.5, 1.0, 1.5), 80).convert("RGBA")
+
+def _bands(image: Image.Image, band_rows: int):
+    for y in range(0, image.height, band_rows):
+        yield image.crop((0, y, image.width, min(image.height, y + band_rows)))
+
+def _mean_diff(a: Image.Image, b: Image.Image) -> float:
+    return max(ImageStat.Stat(ImageChops.difference(a, b)).mean)
+
+@pytest.mark.parametrize("band_rows", [1, 7, 64, 333, 1100])
+@pytest.mark.parametrize("dst", [(295, 1080), (97, 356), (150, 550), (30, 110)])
+def test_band_fed_scaler_matches_one_resize(band_rows, dst):
+    image = _strip()
+    scaler = _BandScaler(image.size, dst)
+    for band in _bands(image, band_rows):
+        scaler.feed(band)
+    assert scaler.out_y == dst[1]
+    # Not bit-exact: where a source row's centre falls exactly on an output row's edge,
+    # Pillow's BOX filter rounds it into one row or the other depending on the box origin
+    assert _mean_diff(scaler.canvas, image.resize(dst, Image.Resampling.BOX)) < 0.1
+
+@pytest.mark.parametrize("band_rows", [5, 64])
+def test_renditions_match_whole_image_resizes(band_rows):
+    image = _strip()
+    builder = RenditionBuilder(image.size)
+    assert len(list(builder.tap(_bands(image, band_rows)))) == -(-image.height // band_rows)
+    built = builder.finish()
+    assert [(name, img.size) for name, img in built] == rendition_sizes(image.size)
+    for _, img in built:
+        assert _mean_diff(img, image.resize(img.size, Image.Resampling.BOX)) < 1.0
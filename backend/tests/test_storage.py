@@ -0,0 +1,124 @@
+import os, threading, time
+import pytest
+from services.storage import CachedStorage, LocalStorage, MemoryStorage, S3Storage, Storage
+
+@pytest.fixture
+def s3_client():
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="test",
+                              aws_secret_access_key="test")
+        client.create_bucket(Bucket="strips")
+        yield client
+
+@pytest.fixture(params=["local", "memory", "s3", "cached"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path))
+    if request.param == "memory":
+        return MemoryStorage(1024 * 1024)
+    if request.param == "s3":
+        return S3Storage("strips", prefix="strips/", client=request.getfixturevalue("s3_client"))
+    return CachedStorage(LocalStorage(str(tmp_path)), 1024 * 1024, ttl=60, max_object_bytes=64 * 1024)
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
+
+def test_round_trip(storage):
+    chunks = [b"a" * 70_000, b"b" * 5, b"c" * 3]
+    assert storage.put("ab/cd/abcd.png", iter(chunks)) == 70_008
+    with storage.get("ab/cd/abcd.png") as fh:
+        assert fh.read() == b"".join(chunks)
+    st = storage.stat("ab/cd/abcd.png")
+    assert st.size == 70_008 and st.etag
+    assert storage.exists("ab/cd/abcd.png")
+
+def test_object_appears_only_after_its_last_chunk(storage):
+    """store_strip writes the renditions from inside the full strip's put and relies on this"""
+    def chunks():
+        yield b"full"
+        assert not storage.exists("full.png")
+        storage.put("thumb.png", [b"thumb"])
+    storage.put("full.png", chunks())
+    assert storage.exists("full.png") and storage.exists("thumb.png")
+
+def test_overwrite_changes_etag(storage):
+    storage.put("k.png", [b"one"])
+    first = storage.stat("k.png").etag
+    time.sleep(0.01)
+    storage.put("k.png", [b"other"])
+    assert storage.stat("k.png").etag != first
+    with storage.get("k.png") as fh:
+        assert fh.read() == b"other"
+
+def test_missing_keys(storage):
+    assert storage.stat("nope.png") is None
+    assert not storage.exists("nope.png")
+    with pytest.raises(FileNotFoundError):
+        storage.get("nope.png")
+    storage.delete("nope.png")
+
+def test_delete(storage):
+    storage.put("ab/cd/gone.png", [b"x"])
+    storage.delete("ab/cd/gone.png")
+    assert storage.stat("ab/cd/gone.png") is None
+
+def test_local_concurrent_first_writes_do_not_collide(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    start = threading.Barrier(4)
+    errors = []
+
+    def write(tag: bytes):
+        def chunks():
+            start.wait()
+            for _ in range(50):
+                yield tag * 1000
+        try:
+            storage.put("ab/cd/same.webp", chunks())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(bytes([65 + i]),)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    with storage.get("ab/cd/same.webp") as fh:
+        data = fh.read()
+    # One writer's complete output, never an interleaving
+    assert len(data) == 50_000 and len(set(data)) == 1
+    assert os.listdir(tmp_path / "ab" / "cd") == ["same.webp"]
+
+class _CountingStorage(LocalStorage):
+    gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super().get(key)
+
+def test_cached_storage_serves_hits_from_memory(tmp_path):
+    backend = _CountingStorage(str(tmp_path))
+    storage = CachedStorage(backend, 1024 * 1024, ttl=60, max_object_bytes=1024)
+    storage.put("hot.png", [b"hot"])
+    for _ in range(3):
+        with storage.get("hot.png") as fh:
+            assert fh.read() == b"hot"
+    assert backend.gets == 0
+    assert storage.path("hot.png") is None
+
+def test_cached_storage_never_outlives_the_backend(tmp_path):
+    backend = LocalStorage(str(tmp_path))
+    storage = CachedStorage(backend, 1024 * 1024, ttl=60, max_object_bytes=1024)
+    storage.put("gone.png", [b"gone"])
+    os.remove(backend.path("gone.png"))
+    assert not storage.exists("gone.png")
+    with pytest.raises(FileNotFoundError):
+        storage.get("gone.png")
+    storage.put("swapped.png", [b"old"])
+    time.sleep(0.01)
+    backend.put("swapped.png", [b"new bytes"])
+    with storage.get("swapped.png") as fh:
+        assert fh.read() == b"new bytes"